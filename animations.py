@@ -0,0 +1,149 @@
+"""Records the collapse of a wave function as a stream of frames, or as an animated GIF.
+
+Each frame only holds the region of the canvas which changed since the previous frame, so frames
+can be consumed (or encoded) one at a time, without the whole animation being held in memory.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO, Iterator
+
+from PIL import GifImagePlugin, Image as pillow
+import numpy as np
+import numpy.typing as npt
+from renderers import CanvasRenderer
+import solvers
+
+
+@dataclass
+class Frame:
+    decisions: int
+    offset: tuple[int, int]
+    pixels: npt.NDArray[np.uint8]
+
+
+def capture_frame(canvas: CanvasRenderer, decisions: int = 0) -> Frame | None:
+    """Updates the canvas, returning the bounding box of any repainted cells as a frame."""
+
+    rows, columns = canvas.update()
+    if not len(rows):
+        return None
+
+    image_height, image_width = canvas.renderer.atlas.shape[1:3]
+    top, bottom = rows.min() * image_height, (rows.max() + 1) * image_height
+    left, right = columns.min() * image_width, (columns.max() + 1) * image_width
+    return Frame(decisions, (int(left), int(top)), canvas.canvas[top:bottom, left:right].copy())
+
+
+def record_collapse(
+    solver: solvers.BacktrackingSolver,
+    canvas: CanvasRenderer,
+    every: int = 1,
+) -> Iterator[Frame]:
+    """Collapses the wave function, yielding the changed region after every `every` decisions.
+
+    The first frame always covers the whole canvas and the last shows the final collapse.
+    """
+
+    wave_function = solver.wave_function
+    frame = capture_frame(canvas)
+    if frame:
+        yield frame
+    while not wave_function.collapsed:
+        solver.step()
+        if not solver.stats.decisions % every or wave_function.collapsed:
+            frame = capture_frame(canvas, solver.stats.decisions)
+            if frame:
+                yield frame
+
+
+class GifWriter:
+    """Encodes frames into an animated GIF as they arrive, using a single fixed palette.
+
+    The palette is chosen from the tile images and the superpositions present in the first frame,
+    which must cover the whole canvas. Later frames are written as sub-images at their offsets,
+    left in place beneath the frames which follow.
+    """
+
+    def __init__(
+        self,
+        file: Path | BinaryIO,
+        canvas: CanvasRenderer,
+        duration: int = 40,
+        loop: int | None = 0,
+    ):
+        """Prepares the writer, with `duration` in milliseconds and `loop = None` playing once."""
+
+        self.canvas = canvas
+        self.duration = duration
+        self.loop = loop
+        self.frames = 0
+        self.closed = False
+        self._file = open(file, 'wb') if isinstance(file, Path) else file
+        self._owns_file = isinstance(file, Path)
+
+        renderer, wave_function = canvas.renderer, canvas.wave_function
+        channels = renderer.atlas.shape[-1]
+        colours = np.concatenate([
+            renderer.atlas.reshape(-1, channels),
+            renderer.lookup_masks(list(set(wave_function.states))).reshape(-1, channels),
+        ])
+        self.palette = pillow.fromarray(colours[:, None, :]).quantize(256)
+
+
+    def __enter__(self) -> 'GifWriter':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+    def write(self, frame: Frame) -> None:
+        image = pillow.fromarray(frame.pixels).quantize(
+            palette = self.palette,
+            dither = pillow.Dither.NONE,
+        )
+
+        if not self.frames:
+            assert frame.offset == (0, 0) and frame.pixels.shape == self.canvas.canvas.shape
+            header, _ = GifImagePlugin.getheader(image, info = {'loop': self.loop})
+            self._file.write(b''.join(header))
+
+        # Frames are not disposed of, so each is drawn over the previous ones
+        data = GifImagePlugin.getdata(  # type: ignore[no-untyped-call]
+            image,
+            frame.offset,
+            duration = self.duration,
+            disposal = 1,
+        )
+        self._file.write(b''.join(data))
+        self.frames += 1
+
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._file.write(b';')  # Trailer
+        if self._owns_file:
+            self._file.close()
+        self.closed = True
+
+
+def save_gif(
+    path: Path,
+    solver: solvers.BacktrackingSolver,
+    canvas: CanvasRenderer,
+    every: int = 1,
+    duration: int = 40,
+) -> int:
+    """Collapses the wave function, writing its progress to an animated GIF, and counts frames."""
+
+    with GifWriter(path, canvas, duration) as writer:
+        for frame in record_collapse(solver, canvas, every):
+            writer.write(frame)
+    return writer.frames
@@ -0,0 +1,171 @@
+"""Generates tile set images headlessly in batches, writing them to disk rather than showing them.
+
+Example:
+    python batch_runner.py Circuits 64 64 --seeds 0 100 --output output/circuits
+"""
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from pathlib import Path
+import time
+
+from tile_sets import ImageTileSet, TileImageStore, GreenKnots, Circles, Circuits
+from bitset_wave_functions import BitsetWaveFunction
+from wave_functions import Cell
+import animations
+import image_runner
+import renderers
+import solvers
+import grids
+
+
+TILE_SETS: dict[str, type[ImageTileSet]] = {
+    tile_set_type.__name__: tile_set_type for tile_set_type in [GreenKnots, Circles, Circuits]
+}
+
+
+@dataclass
+class BatchTimings:
+    seed: int
+    generation: float = 0.
+    rendering: float = 0.
+    frames: int = 0
+    succeeded: bool = False
+
+
+def generate_image(
+    template: BitsetWaveFunction,
+    renderer: renderers.AtlasRenderer,
+    seed: int,
+    output_path: Path,
+    frames_every: int | None = None,
+    max_backtracks: int | None = 1000,
+    animate: bool = False,
+) -> BatchTimings:
+    """Collapses a seeded clone of the template and saves the image (and any progress frames).
+
+    Progress frames are saved as separate images, or with `animate` as a single animated GIF.
+    """
+
+    timings = BatchTimings(seed)
+
+    def save_image(path: Path) -> None:
+        start_time = time.perf_counter()
+        with canvas.render() as image:
+            image.save(path)
+        timings.rendering += time.perf_counter() - start_time
+
+    def save_frame() -> None:
+        if not animation:
+            save_image(output_path.with_stem(f'{output_path.stem}_{timings.frames:04d}'))
+            timings.frames += 1
+            return
+        start_time = time.perf_counter()
+        frame = animations.capture_frame(canvas, solver.stats.decisions)
+        if frame:
+            animation.write(frame)
+            timings.frames += 1
+        timings.rendering += time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    wave_function = template.clone(seed)
+    canvas = renderers.CanvasRenderer(renderer, wave_function)
+    solver = solvers.BacktrackingSolver(wave_function, max_backtracks)
+    animation = (
+        animations.GifWriter(output_path.with_suffix('.gif'), canvas) if animate else None
+    )
+    try:
+        while not wave_function.collapsed:
+            if frames_every and not solver.stats.decisions % frames_every:
+                timings.generation += time.perf_counter() - start_time
+                save_frame()
+                start_time = time.perf_counter()
+            solver.step()
+    except Cell.ConstraintError:
+        timings.generation += time.perf_counter() - start_time
+        return timings
+    finally:
+        if animation:
+            save_frame()
+            animation.close()
+
+    timings.generation += time.perf_counter() - start_time
+    save_image(output_path)
+    timings.succeeded = True
+    return timings
+
+
+def main() -> None:
+
+    parser = ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('tile_set', choices = TILE_SETS)
+    parser.add_argument('size_x', type = int)
+    parser.add_argument('size_y', type = int)
+    parser.add_argument('--tile-types', nargs = '+', metavar = 'TYPE', default = [])
+    parser.add_argument(
+        '--weights', nargs = '+', metavar = 'TYPE=WEIGHT', default = [],
+        help = 'make each rotation of a tile type more (or less) likely to be selected',
+    )
+    parser.add_argument('--cyclic-x', action = 'store_true')
+    parser.add_argument('--cyclic-y', action = 'store_true')
+    parser.add_argument(
+        '--seeds', nargs = 2, type = int, metavar = ('START', 'STOP'), default = (0, 1),
+    )
+    parser.add_argument('--frames-every', type = int, metavar = 'DECISIONS')
+    parser.add_argument('--animate', action = 'store_true', help = 'save frames as a GIF')
+    parser.add_argument('--max-backtracks', type = int, default = 1000)
+    parser.add_argument('--output', type = Path, default = Path('output'))
+    parser.add_argument(
+        '--atlas-cache', type = Path, metavar = 'DIRECTORY',
+        help = 'save the tile atlas to be memory-mapped by later runs',
+    )
+    args = parser.parse_args()
+
+    tile_set_type = TILE_SETS[args.tile_set]
+    weights = {}
+    for weight_spec in args.weights:
+        name, _, weight = weight_spec.partition('=')
+        weights[tile_set_type.TileTypes[name]] = float(weight)
+    tile_set = tile_set_type(
+        [tile_set_type.TileTypes[name] for name in args.tile_types],
+        weights,
+    )
+    renderer = renderers.AtlasRenderer(
+        tile_set,
+        image_store = TileImageStore(args.atlas_cache) if args.atlas_cache else None,
+    )
+    grid = grids.Grid2D(args.size_x, args.size_y, args.cyclic_x, args.cyclic_y)
+    template = image_runner.create_wave_function(tile_set, grid)
+    args.output.mkdir(parents = True, exist_ok = True)
+
+    batch_start_time = time.perf_counter()
+    all_timings = []
+    for seed in range(*args.seeds):
+        timings = generate_image(
+            template,
+            renderer,
+            seed,
+            args.output / f'{args.tile_set.lower()}_{seed}.png',
+            args.frames_every or (1 if args.animate else None),
+            args.max_backtracks,
+            args.animate,
+        )
+        all_timings.append(timings)
+        print(
+            f'Seed {seed}: '
+            + ('generated' if timings.succeeded else 'FAILED')
+            + f' in {timings.generation:.3f}s, rendered in {timings.rendering:.3f}s'
+            + (f' ({timings.frames} frames)' if timings.frames else ''),
+        )
+
+    succeeded = sum(timings.succeeded for timings in all_timings)
+    print(
+        f'{succeeded}/{len(all_timings)} images generated in '
+        f'{time.perf_counter() - batch_start_time:.1f}s '
+        f'(generation {sum(timings.generation for timings in all_timings):.1f}s, '
+        f'rendering {sum(timings.rendering for timings in all_timings):.1f}s)',
+    )
+    print(f'Render cache: {renderer.cache.stats}')
+
+
+if __name__ == '__main__':
+    main()
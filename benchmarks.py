@@ -0,0 +1,372 @@
+"""Times the wave function engines on representative workloads.
+
+Example:
+    python benchmarks.py bulk_constraints
+    python benchmarks.py startup --baseline <git ref>
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import FunctionType, ModuleType
+from typing import Callable, Iterable, Sequence
+import gc
+import io
+import random
+import subprocess
+import sys
+import tarfile
+import time
+import tracemalloc
+
+from tile_sets import Tile, Connector, Circuits, ascii_box_tiles, hex_pipe_tiles
+from tile_sets import TileImageStore, voxel_pipe_tiles
+from bitset_wave_functions import BitsetWaveFunction
+from wave_functions import WaveFunction
+from overlapping import OverlappingModel
+import image_runner
+import renderers
+import solvers
+import grids
+
+
+def best_time(function: Callable[[], object], repeats: int = 3) -> float:
+    """Returns the fastest of several timed calls, in seconds."""
+
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def benchmark_bulk_constraints(grid_size: int = 128, fraction: float = 0.2) -> None:
+    """Pre-seeds a map with tiles from a solved map, cell by cell and then in a single batch."""
+
+    tile_set = Circuits(Circuits.best_tile_subset)
+    grid = grids.Grid2D(grid_size, grid_size, False, False)
+    solved = image_runner.create_wave_function(tile_set, grid, seed = 0)
+    solvers.BacktrackingSolver(solved).run()
+    num_fixed = int(fraction * grid.size_total)
+    fixed_indices = random.Random(0).sample(range(grid.size_total), num_fixed)
+    fixed_tiles = {
+        index: solved.tiles[solved.states[index].bit_length() - 1] for index in fixed_indices
+    }
+
+    def assign_individually() -> None:
+        wave_function = image_runner.create_wave_function(tile_set, grid)
+        for index, tile in fixed_tiles.items():
+            wave_function.cells[index].tile = tile
+
+    def apply_in_bulk() -> None:
+        wave_function = image_runner.create_wave_function(tile_set, grid)
+        wave_function.apply_constraints(fixed_tiles = fixed_tiles)
+
+    setup_time = best_time(lambda: image_runner.create_wave_function(tile_set, grid))
+    individual_time = best_time(assign_individually) - setup_time
+    bulk_time = best_time(apply_in_bulk) - setup_time
+    print(
+        f'{len(fixed_tiles)} fixed tiles on a {grid_size}x{grid_size} grid: '
+        f'{individual_time:.3f}s individually, {bulk_time:.3f}s in bulk '
+        f'({individual_time / bulk_time:.1f}x)',
+    )
+
+
+def get_retained_size(root: object, shared: Iterable[object] = ()) -> int:
+    """Sums the sizes of the objects reachable from the root, counting each object once.
+
+    Objects reachable from those shared, such as the grid and tiles, are left out, as are classes,
+    modules and functions.
+    """
+
+    seen: set[int] = set()
+
+    def visit(objects: list[object]) -> int:
+        total_size = 0
+        while objects:
+            referents = []
+            for obj in objects:
+                if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType)):
+                    continue
+                seen.add(id(obj))
+                total_size += sys.getsizeof(obj)
+                referents.append(obj)
+            objects = gc.get_referents(*referents)
+        return total_size
+
+    visit(list(shared))
+    return visit([root])
+
+
+def benchmark_memory(grid_sizes: Sequence[int] = (256, 1024)) -> None:
+    """Measures the memory per cell of each engine once built, and of a collapsed bitset engine.
+
+    The neighbour tables of the grid are built beforehand, as they are shared by every run over
+    the grid. The reference engine is only measured on the smallest grid once built, as it is too
+    slow to build on the larger ones and has no backtracking solver. A collapsed wave function
+    holds a distinct state for each cell, so it is measured through a clone, without the trail.
+    """
+
+    tile_set = Circuits(Circuits.best_tile_subset)
+    engines: list[tuple[str, Callable[[grids.Grid], object]]] = [
+        ('bitset', lambda grid: BitsetWaveFunction(grid, tile_set.tiles, tile_set.compatibility)),
+        ('reference', lambda grid: WaveFunction(grid, tile_set.tiles)),
+    ]
+
+    for grid_size in grid_sizes:
+        grid = grids.Grid2D(grid_size, grid_size, False, False)
+        grid.get_neighbour_tables()
+        for name, create_wave_function in engines:
+            if name == 'reference' and grid_size != min(grid_sizes):
+                continue
+
+            tracemalloc.start()
+            start_time = time.perf_counter()
+            wave_function = create_wave_function(grid)
+            construction_time = time.perf_counter() - start_time
+            allocated, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del wave_function
+
+            print(
+                f'{name} {grid_size}x{grid_size}: '
+                f'{allocated / grid.size_total:.1f} bytes per cell, '
+                f'{allocated / 2**20:.1f} MiB in total, built in {construction_time:.2f}s',
+            )
+
+        wave_function = BitsetWaveFunction(grid, tile_set.tiles, tile_set.compatibility, seed = 0)
+        start_time = time.perf_counter()
+        solvers.BacktrackingSolver(wave_function).run()
+        collapse_time = time.perf_counter() - start_time
+        retained = get_retained_size(
+            wave_function.clone(), shared = (grid, tile_set.tiles, tile_set.compatibility),
+        )
+        print(
+            f'bitset {grid_size}x{grid_size} collapsed: '
+            f'{retained / grid.size_total:.1f} bytes per cell, '
+            f'{retained / 2**20:.1f} MiB in total, collapsed in {collapse_time:.2f}s',
+        )
+
+
+def benchmark_templates(grid_size: int = 256, repeats: int = 10) -> None:
+    """Compares building and constraining a wave function for each seed with cloning a template."""
+
+    tile_set = Circuits(Circuits.best_tile_subset)
+    grid = grids.Grid2D(grid_size, grid_size, False, False)
+    template = image_runner.create_wave_function(tile_set, grid)
+
+    rebuild_time = best_time(lambda: image_runner.create_wave_function(tile_set, grid), repeats)
+    clone_time = best_time(lambda: template.clone(seed = 0), repeats)
+    print(
+        f'{grid_size}x{grid_size} grid: {rebuild_time * 1000:.1f}ms to rebuild, '
+        f'{clone_time * 1000:.1f}ms to clone ({rebuild_time / clone_time:.0f}x)',
+    )
+
+
+def benchmark_hex(grid_size: int = 256) -> None:
+    """Compares collapsing hexagonal and square grids of the same size, with pipe-like tiles."""
+
+    hex_connectors, hex_tiles = hex_pipe_tiles()
+    square_connectors, square_tiles = ascii_box_tiles()
+    runs: list[tuple[str, grids.Grid, list[Tile], Connector]] = [(
+        'square',
+        grids.Grid2D(grid_size, grid_size, False, False),
+        square_tiles,
+        square_connectors[0],
+    ), (
+        'hex',
+        grids.GridHex(grid_size, grid_size, False, False),
+        hex_tiles,
+        hex_connectors[0],
+    )]
+
+    for name, grid, tiles, boundary_connector in runs:
+        start_time = time.perf_counter()
+        wave_function = BitsetWaveFunction(grid, tiles, seed = 0)
+        for direction in grid.directions:
+            wave_function.apply_boundary_constraint(direction, {boundary_connector})
+        stats = solvers.BacktrackingSolver(wave_function).run()
+        print(
+            f'{name} {grid_size}x{grid_size} with {len(tiles)} tiles: '
+            f'collapsed in {time.perf_counter() - start_time:.2f}s '
+            f'({stats.backtracks} backtracks, {wave_function.propagation_stats.enqueued} '
+            f'propagations)',
+        )
+
+
+def benchmark_voxels(grid_size: int = 64) -> None:
+    """Collapses a cubic volume of pipe tiles, measuring the time taken and memory allocated.
+
+    Tracing allocations slows the collapse several times over, so the time is taken from an
+    untraced run and the peak memory from a second, traced run with the same seed.
+    """
+
+    connectors, tiles = voxel_pipe_tiles()
+    grid = grids.Grid3D(grid_size, grid_size, grid_size, False, False, False)
+    grid.get_neighbour_tables()
+
+    def collapse() -> solvers.SolverStats:
+        wave_function = BitsetWaveFunction(grid, tiles, seed = 0)
+        for direction in grid.directions:
+            wave_function.apply_boundary_constraint(direction, {connectors[0]})
+        return solvers.BacktrackingSolver(wave_function).run()
+
+    start_time = time.perf_counter()
+    stats = collapse()
+    collapse_time = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    collapse()
+    _, peak_allocated = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f'{grid_size}x{grid_size}x{grid_size} with {len(tiles)} tiles: '
+        f'collapsed in {collapse_time:.2f}s ({stats.backtracks} backtracks), '
+        f'peak of {peak_allocated / 2**20:.1f} MiB '
+        f'({peak_allocated / grid.size_total:.1f} bytes per cell)',
+    )
+
+
+def benchmark_patterns(sample_tiles: int = 36, grid_size: int = 48) -> None:
+    """Extracts the overlapping patterns of a rendered sample image, then collapses a grid."""
+
+    tile_set = Circuits(Circuits.best_tile_subset)
+    sample_grid = grids.Grid2D(sample_tiles, sample_tiles, True, True)
+    sample_wave_function = image_runner.create_wave_function(tile_set, sample_grid, seed = 0)
+    solvers.BacktrackingSolver(sample_wave_function).run()
+    sample = renderers.AtlasRenderer(tile_set).render(sample_wave_function)
+
+    model = OverlappingModel(sample, 3, rotations = True, reflections = True)
+    extraction_time = best_time(
+        lambda: OverlappingModel(sample, 3, rotations = True, reflections = True),
+    )
+
+    start_time = time.perf_counter()
+    wave_function = model.create_wave_function(grids.Grid2D(grid_size, grid_size, True, True), 0)
+    stats = solvers.BacktrackingSolver(wave_function).run()
+    print(
+        f'{len(model.tiles)} patterns from a {sample.width}x{sample.height} sample '
+        f'in {extraction_time:.3f}s, {grid_size}x{grid_size} collapsed in '
+        f'{time.perf_counter() - start_time:.2f}s ({stats.backtracks} backtracks)',
+    )
+
+
+def benchmark_atlas(repeats: int = 10) -> None:
+    """Compares building renderers for fresh tile sets from a new, warm or memory-mapped store."""
+
+    def build_renderer(image_store: TileImageStore) -> None:
+        renderers.AtlasRenderer(Circuits(), image_store = image_store)
+
+    warm_store = TileImageStore()
+    build_renderer(warm_store)
+    with TemporaryDirectory() as cache_directory:
+        build_renderer(TileImageStore(Path(cache_directory)))
+        timings = {
+            'decoded': best_time(lambda: build_renderer(TileImageStore()), repeats),
+            'warm': best_time(lambda: build_renderer(warm_store), repeats),
+            'mapped': best_time(
+                lambda: build_renderer(TileImageStore(Path(cache_directory))), repeats,
+            ),
+        }
+    print(', '.join(f'{name} {timing * 1000:.2f}ms' for name, timing in timings.items()))
+
+
+def benchmark_startup(
+    runners: Sequence[str] = ('tiles_cli_1d.py', 'tiles_cli_2d.py'),
+    baseline: str | None = None,
+    repeats: int = 7,
+) -> None:
+    """Times complete runs of the text runners in new interpreters, optionally against a git ref.
+
+    The image runners are left out, as they display their images. Given a baseline ref, the tree
+    at that ref is exported into a temporary directory and its runners are timed as well. Only
+    completed runs are timed, and each runner also reports whether NumPy or Pillow was loaded,
+    which the text runners should not need.
+    """
+
+    def time_run(runner: str, directory: Path) -> float:
+        timings = []
+        for _ in range(10 * repeats):
+            start_time = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, runner],
+                cwd = directory, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL,
+            )
+            if not completed.returncode:  # Runners without backtracking may hit a contradiction
+                timings.append(time.perf_counter() - start_time)
+                if len(timings) == repeats:
+                    break
+        assert timings, f'{runner} never completed in {directory}'
+        return min(timings)
+
+    current_directory = Path(__file__).resolve().parent
+    with TemporaryDirectory() as baseline_directory:
+        if baseline is not None:
+            archive = subprocess.run(
+                ['git', 'archive', baseline],
+                capture_output = True, check = True, cwd = current_directory,
+            ).stdout
+            with tarfile.open(fileobj = io.BytesIO(archive)) as baseline_tree:
+                baseline_tree.extractall(baseline_directory, filter = 'data')
+
+        interpreter_time = best_time(
+            lambda: subprocess.run([sys.executable, '-c', 'pass'], check = True), repeats,
+        )
+        print(f'interpreter: {interpreter_time * 1000:.0f}ms to start')
+        check_statement = (
+            'import runpy, sys; runpy.run_path({!r}, run_name = "__main__"); '
+            'sys.exit("{}" in sys.modules)'
+        )
+        for runner in runners:
+            timings = [f'{time_run(runner, current_directory) * 1000:.0f}ms to run']
+            if baseline is not None:
+                baseline_time = time_run(runner, Path(baseline_directory))
+                timings.append(f'{baseline_time * 1000:.0f}ms at {baseline}')
+            loaded = [
+                name for name, package in [('NumPy', 'numpy'), ('Pillow', 'PIL')]
+                if subprocess.run(
+                    [sys.executable, '-c', check_statement.format(runner, package)],
+                    cwd = current_directory, stdout = subprocess.DEVNULL,
+                ).returncode
+            ]
+            if loaded:
+                timings.append(f'loading {" and ".join(loaded)}')
+            print(f'{runner}: {", ".join(timings)}')
+
+
+BENCHMARKS: dict[str, Callable[[], None]] = {
+    'bulk_constraints': benchmark_bulk_constraints,
+    'memory': benchmark_memory,
+    'templates': benchmark_templates,
+    'hex': benchmark_hex,
+    'voxels': benchmark_voxels,
+    'patterns': benchmark_patterns,
+    'atlas': benchmark_atlas,
+    'startup': benchmark_startup,
+}
+
+
+def main() -> None:
+
+    parser = ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument(
+        'benchmarks', nargs = '*', metavar = 'NAME', help = f'any of {", ".join(BENCHMARKS)}',
+    )
+    parser.add_argument(
+        '--baseline', metavar = 'REF', help = 'a git ref to compare the startup benchmark against',
+    )
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark {name!r}')
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f'# {name}')
+        if name == 'startup':
+            benchmark_startup(baseline = args.baseline)
+        else:
+            BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
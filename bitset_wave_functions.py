@@ -0,0 +1,631 @@
+"""A wave function engine which tracks cell states as bitmasks over an indexed tile set.
+
+Each cell state is stored as an integer whose set bits identify the tiles still possible in that
+cell. Tile compatibility is compiled once per tile set into per-direction "allowed neighbour" masks
+(see `tile_sets.compatibility`), so propagation reduces to bitwise operations rather than connector
+set arithmetic.
+"""
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING, Collection, Iterable, Iterator, Mapping, Self, Sequence, overload
+import copy
+import heapq
+import math
+import random
+
+import grids
+from tile_sets import Tile, Connector, TileCompatibility, compile_compatibility
+from wave_functions import Cell, CellLike, PropagationStats
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    import numpy as np
+    import numpy.typing as npt
+
+
+CellConstraint = tuple[int, grids.Direction, set[Connector]]
+
+
+def iterate_bits(mask: int) -> Iterator[int]:
+    """Yields the index of each set bit in the mask, from lowest to highest."""
+
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
+
+
+class BitsetCell:
+    """A lightweight view onto a single cell of a bitset wave function."""
+
+    __slots__ = ('wave_function', 'index')
+
+    ConstraintError = Cell.ConstraintError
+
+    def __init__(self, wave_function: 'BitsetWaveFunction', index: int):
+        self.wave_function = wave_function
+        self.index = index
+
+    def __str__(self) -> str:
+        return f'Cell {self.id}'
+
+
+    @property
+    def id(self) -> str:
+        return self.wave_function.grid.make_cell_id(self.index)
+
+    @property
+    def mask(self) -> int:
+        return self.wave_function.states[self.index]
+
+    @property
+    def state(self) -> list[Tile]:
+        return self.wave_function.tiles_from_mask(self.mask)
+
+
+    @property
+    def collapsed(self) -> bool:
+        return self.mask.bit_count() == 1
+
+    @property
+    def tile(self) -> Tile | None:
+        return self.wave_function.tiles[self.mask.bit_length() - 1] if self.collapsed else None
+
+    @tile.setter
+    def tile(self, tile: Tile) -> None:
+        """Forces a collapse of the current cell and triggers a propagation wave."""
+        self.wave_function.collapse(self.index, tile)
+
+
+class BitsetCells(Sequence[BitsetCell]):
+    """The cells of a bitset wave function, created as they are accessed rather than stored."""
+
+    __slots__ = ('wave_function',)
+
+    def __init__(self, wave_function: 'BitsetWaveFunction'):
+        self.wave_function = wave_function
+
+    def __len__(self) -> int:
+        return len(self.wave_function.states)
+
+
+    @overload
+    def __getitem__(self, key: int) -> BitsetCell:
+        pass
+
+    @overload
+    def __getitem__(self, key: slice) -> list[BitsetCell]:
+        pass
+
+    def __getitem__(self, key: int | slice) -> BitsetCell | list[BitsetCell]:
+        if isinstance(key, slice):
+            return [BitsetCell(self.wave_function, index) for index in range(len(self))[key]]
+        return BitsetCell(self.wave_function, range(len(self))[key])
+
+
+class BitsetWaveFunction:
+    """A wave function whose cell states are bitmasks over the tiles.
+
+    With uniform tile weights, the most constrained cell is the one with the fewest tiles left,
+    found from the size buckets. Otherwise it is the one with the lowest Shannon entropy, kept
+    in a heap from the sum of the weights and of the `weight * log(weight)` terms of each cell,
+    which are updated for each tile as it is removed (or restored) rather than recomputed.
+    """
+
+    def __init__(
+        self,
+        grid: grids.Grid,
+        tile_set: Sequence[Tile],
+        compatibility: TileCompatibility | None = None,
+        seed: int | None = None,
+    ):
+        self.grid = grid
+        self.random = random.Random(seed)
+        self.tiles = list(tile_set)
+        self.tile_indices = {id(tile): index for index, tile in enumerate(self.tiles)}
+
+        self.compatibility = (
+            compatibility if compatibility is not None else compile_compatibility(self.tiles)
+        )
+        assert self.compatibility.num_tiles == len(self.tiles)
+
+        # States fit a flat array of 64 bit words, unless there are too many tiles
+        self.states: array[int] | list[int] = (
+            array('Q', [self.compatibility.full_mask]) if len(self.tiles) <= 64
+            else [self.compatibility.full_mask]
+        ) * grid.size_total
+
+        # Uncollapsed cells are bucketed by state size, for constant time selection
+        self._size_buckets = [array('q') for _ in range(len(self.tiles) + 1)]
+        self._bucket_positions = array('q', [-1]) * grid.size_total
+        if len(self.tiles) > 1:
+            self._size_buckets[-1] = array('q', range(grid.size_total))
+            self._bucket_positions = self._size_buckets[-1][:]
+
+        self._queue: deque[int] = deque()
+        self._queued = bytearray(grid.size_total)
+        self.propagation_stats = PropagationStats()
+        self._trail: list[tuple[int, int]] | None = None
+        self._changed_cells: set[int] | None = None  # Only tracked once changes are first popped
+        self.cells = BitsetCells(self)
+
+        # Neighbours are held as one table per direction, with -1 marking a missing neighbour
+        self._neighbour_tables = list(grid.get_neighbour_tables().items())  # Shared with the grid
+
+        # Entropy is only tracked when the tiles have different weights
+        self.weights = [tile.weight for tile in self.tiles]
+        assert all(weight > 0 for weight in self.weights), 'Tile weights must be positive'
+        self.weighted = len(set(self.weights)) > 1
+        self._log_weights = [weight * math.log(weight) for weight in self.weights]
+        self._weight_sums = array('d')
+        self._log_weight_sums = array('d')
+        self._entropy_noise = array('d')
+        self._entropy_heap: list[tuple[float, int]] = []
+        if self.weighted:
+            self._weight_sums = array('d', [sum(self.weights)]) * grid.size_total
+            self._log_weight_sums = array('d', [sum(self._log_weights)]) * grid.size_total
+            self._reset_entropy_heap()
+
+
+    def get_neighbours(self, index: int) -> dict[grids.Direction, int]:
+        """Maps the directions from a cell to the indices of its neighbours."""
+
+        return {
+            direction: neighbour_table[index]
+            for direction, neighbour_table in self._neighbour_tables
+            if neighbour_table[index] >= 0
+        }
+
+
+    def clone(self, seed: int | None = None) -> Self:
+        """Copies the current states into a new wave function with its own random generator.
+
+        The tiles, compatibility and neighbour tables are shared rather than copied, so a wave
+        function with its boundary constraints applied can be cloned cheaply for each seeded run.
+        """
+
+        assert not self._queue, 'Propagation must be complete before cloning'
+        clone = copy.copy(self)
+        clone.random = random.Random(seed)
+        clone.states = self.states[:]
+        clone._size_buckets = [size_bucket[:] for size_bucket in self._size_buckets]
+        clone._bucket_positions = self._bucket_positions[:]
+        clone._queue = deque()
+        clone._queued = bytearray(len(self._queued))
+        clone.propagation_stats = PropagationStats()
+        clone._trail = None
+        clone._changed_cells = None
+        clone.cells = BitsetCells(clone)
+        if self.weighted:
+            clone._weight_sums = self._weight_sums[:]
+            clone._log_weight_sums = self._log_weight_sums[:]
+            clone._reset_entropy_heap()
+        return clone
+
+
+    def get_tile_indices(self) -> 'npt.NDArray[np.signedinteger[Any]]':
+        """Arranges the tile index of each cell in the shape of the grid, or -1 if uncollapsed."""
+
+        import numpy as np  # Deferred, as only the voxel runner exports tile indices
+        tile_indices = np.fromiter(
+            (state.bit_length() - 1 if state.bit_count() == 1 else -1 for state in self.states),
+            dtype = np.min_scalar_type(-len(self.tiles)),
+            count = len(self.states),
+        )
+        return tile_indices.reshape(self.grid.shape)
+
+
+    def tiles_from_mask(self, mask: int) -> list[Tile]:
+        return [self.tiles[tile_index] for tile_index in iterate_bits(mask)]
+
+    def mask_from_constraint(self, direction: grids.Direction, constraint: set[Connector]) -> int:
+        """Identifies the tiles which satisfy a constraint acting in the specified direction."""
+
+        flipped_direction = grids.flip_direction(direction)
+        return sum(
+            1 << tile_index
+            for tile_index, tile in enumerate(self.tiles)
+            if flipped_direction in tile.connectors
+            and tile.connectors[flipped_direction].connects_to.intersection(constraint)
+        )
+
+
+    @property
+    def collapsed(self) -> bool:
+        return not any(self._size_buckets[2:])
+
+    def get_most_constrained_cell(self) -> BitsetCell:
+        """Randomly selects a cell with the smallest possibility space (or entropy) remaining."""
+
+        if self.weighted:
+            return self.cells[self._get_lowest_entropy_cell()]
+        for size_bucket in self._size_buckets[2:]:  # Ignore already collapsed cells
+            if size_bucket:
+                return self.cells[self.random.choice(size_bucket)]
+        raise ValueError('All cells are already collapsed')
+
+    def choose_tile(self, cell: CellLike) -> Tile:
+        """Randomly selects one of the tiles still possible in the cell, according to weight."""
+
+        if not self.weighted:
+            return self.random.choice(cell.state)
+        state = cell.state
+        return self.random.choices(state, [tile.weight for tile in state])[0]
+
+
+    def get_entropy(self, index: int) -> float:
+        """Calculates the Shannon entropy of a cell from its running sums of weights.
+
+        Without weights every remaining tile is equally likely, so the entropy follows from the
+        number of tiles alone and no sums are kept.
+        """
+
+        if not self.weighted:
+            return math.log(self.states[index].bit_count())
+        weight_sum = self._weight_sums[index]
+        return math.log(weight_sum) - self._log_weight_sums[index] / weight_sum
+
+
+    def collapse(self, index: int, tile: Tile) -> None:
+        """Forces a collapse of the specified cell and triggers a propagation wave."""
+
+        self._set_state(index, 1 << self.tile_indices[id(tile)])
+        self.propagate_constraints()
+
+
+    def exclude(self, index: int, tile: Tile) -> None:
+        """Removes a tile from the state of the specified cell and triggers a propagation wave."""
+
+        state = self.states[index]
+        constrained_state = state & ~(1 << self.tile_indices[id(tile)])
+        if constrained_state != state:
+            self._set_state(index, constrained_state)
+            self.propagate_constraints()
+
+
+    def checkpoint(self) -> int:
+        """Marks the current state, recording all later changes so that they can be undone."""
+
+        if self._trail is None:
+            self._trail = []
+        return len(self._trail)
+
+
+    def rollback(self, checkpoint: int) -> None:
+        """Restores the state recorded at the checkpoint provided, discarding later checkpoints."""
+
+        assert self._trail is not None and checkpoint <= len(self._trail)
+        while len(self._trail) > checkpoint:
+            index, previous_state = self._trail.pop()
+            restored_tiles = previous_state & ~self.states[index]
+            self._write_state(index, previous_state)
+            self._on_tiles_restored(index, restored_tiles)
+
+
+    def pop_changed_cells(self) -> Collection[int]:
+        """Returns the cells whose states have changed since the last call, or since creation.
+
+        Changes are only tracked from the first call, which returns every cell, so that wave
+        functions which are never rendered incrementally do not pay for the tracking.
+        """
+
+        if self._changed_cells is None:
+            self._changed_cells = set()
+            return range(self.grid.size_total)
+        changed_cells, self._changed_cells = self._changed_cells, set()
+        return changed_cells
+
+
+    def apply_boundary_constraint(
+        self,
+        direction: grids.Direction,
+        constraint: set[Connector],
+    ) -> None:
+        """Applies the constraint given in the specified direction and propagates it as needed.
+
+        N.B. The direction is the direction _the constraint acts in_, not the direction of the
+        boundary relative to the grid.
+        """
+
+        boundary_indices = grids.get_boundary_indices(self.grid, grids.flip_direction(direction))
+        self.apply_constraints([
+            (index, direction, constraint) for index in boundary_indices
+        ])
+
+
+    def apply_constraints(
+        self,
+        constraints: Iterable[CellConstraint] = (),
+        fixed_tiles: Mapping[int, Tile] | None = None,
+    ) -> None:
+        """Applies many cell constraints and fixed tiles at once, with a single propagation wave.
+
+        Each constraint holds a cell index, the direction the constraint acts in and the connectors
+        it allows. Fixed tiles are keyed by cell index.
+        """
+
+        masks: dict[tuple[grids.Direction, frozenset[Connector]], int] = {}
+        try:
+            for index, tile in (fixed_tiles or {}).items():
+                self._constrain_state(index, 1 << self.tile_indices[id(tile)])
+            for index, direction, constraint in constraints:
+                mask_key = (direction, frozenset(constraint))
+                if mask_key not in masks:
+                    masks[mask_key] = self.mask_from_constraint(direction, constraint)
+                self._constrain_state(index, masks[mask_key])
+        except Cell.ConstraintError:
+            self._clear_queue()
+            raise
+
+        self.propagate_constraints()
+
+
+    def propagate_constraints(self) -> None:
+        """Iteratively processes queued cells until a consistent state is reached."""
+
+        try:
+            while self._queue:
+                index = self._queue.popleft()
+                self._queued[index] = False
+                self.propagation_stats.processed += 1
+                self._propagate_from(index)
+        except Cell.ConstraintError:
+            self._clear_queue()
+            raise
+
+
+    def _clear_queue(self) -> None:
+        """Abandons any queued propagation, such as after a contradiction."""
+
+        for index in self._queue:
+            self._queued[index] = False
+        self._queue.clear()
+
+
+    def _enqueue(self, index: int) -> None:
+        """Queues a cell for propagation, unless it is already waiting to be processed."""
+
+        if self._queued[index]:
+            self.propagation_stats.coalesced += 1
+        else:
+            self._queued[index] = True
+            self._queue.append(index)
+            self.propagation_stats.enqueued += 1
+
+
+    def _propagate_from(self, index: int) -> None:
+        """Constrains the neighbours of a changed cell, queuing any which change in turn."""
+
+        state = self.states[index]
+        get_allowed_mask = self.compatibility.get_allowed_mask
+        for direction, neighbour_table in self._neighbour_tables:
+            neighbour_index = neighbour_table[index]
+            if neighbour_index < 0:
+                continue
+            neighbour_state = self.states[neighbour_index]
+            constrained_state = neighbour_state & get_allowed_mask(direction, state)
+            if constrained_state != neighbour_state:
+                self._set_state(neighbour_index, constrained_state)
+
+
+    def _constrain_state(self, index: int, mask: int) -> None:
+        """Removes any tiles outside of the mask from the state of a cell, queuing the change."""
+
+        constrained_state = self.states[index] & mask
+        if constrained_state != self.states[index]:
+            self._set_state(index, constrained_state)
+
+
+    def _set_state(self, index: int, state: int) -> None:
+        """Reduces the state of a cell and triggers the consequences of the removed tiles."""
+
+        if not state:
+            raise Cell.ConstraintError(f'{self.cells[index]} has no remaining state options')
+        previous_state = self.states[index]
+        if self._trail is not None:
+            self._trail.append((index, previous_state))
+        self._write_state(index, state)
+        self._on_tiles_removed(index, previous_state & ~state)
+
+
+    def _write_state(self, index: int, state: int) -> None:
+        """Stores the new state of a cell, keeping the size buckets up to date."""
+
+        previous_state = self.states[index]
+        previous_size = previous_state.bit_count()
+        self.states[index] = state
+        if self._changed_cells is not None:
+            self._changed_cells.add(index)
+        size = state.bit_count()
+        if self.weighted:
+            self._update_entropy(index, previous_state, state)
+        if size == previous_size:
+            return
+
+        # Move the cell between buckets, swapping it with the last entry to remove it
+        position = self._bucket_positions[index]
+        if position >= 0:
+            bucket = self._size_buckets[previous_size]
+            last_index = bucket.pop()
+            if last_index != index:
+                bucket[position] = last_index
+                self._bucket_positions[last_index] = position
+        if size > 1:
+            self._bucket_positions[index] = len(self._size_buckets[size])
+            self._size_buckets[size].append(index)
+        else:
+            self._bucket_positions[index] = -1
+
+
+    def _update_entropy(self, index: int, previous_state: int, state: int) -> None:
+        """Adjusts the weight sums of a cell for the tiles which changed, requeuing the cell."""
+
+        weight_sum, log_weight_sum = self._weight_sums[index], self._log_weight_sums[index]
+        for tile_index in iterate_bits(previous_state & ~state):
+            weight_sum -= self.weights[tile_index]
+            log_weight_sum -= self._log_weights[tile_index]
+        for tile_index in iterate_bits(state & ~previous_state):
+            weight_sum += self.weights[tile_index]
+            log_weight_sum += self._log_weights[tile_index]
+        self._weight_sums[index], self._log_weight_sums[index] = weight_sum, log_weight_sum
+
+        # Outdated heap entries are left in place, to be discarded when they reach the top
+        if state.bit_count() > 1:
+            heapq.heappush(
+                self._entropy_heap,
+                (self.get_entropy(index) + self._entropy_noise[index], index),
+            )
+
+
+    def _reset_entropy_heap(self) -> None:
+        """Draws fresh noise to break ties between equal entropies, then rebuilds the heap."""
+
+        self._entropy_noise = array('d', (
+            1e-6 * self.random.random() for _ in range(self.grid.size_total)
+        ))
+        self._rebuild_entropy_heap()
+
+
+    def _rebuild_entropy_heap(self) -> None:
+        """Builds the entropy heap afresh from the uncollapsed cells."""
+
+        self._entropy_heap = [
+            (self.get_entropy(index) + self._entropy_noise[index], index)
+            for index, state in enumerate(self.states) if state.bit_count() > 1
+        ]
+        heapq.heapify(self._entropy_heap)
+
+
+    def _get_lowest_entropy_cell(self) -> int:
+        """Finds the uncollapsed cell with the lowest entropy, discarding outdated heap entries."""
+
+        if len(self._entropy_heap) > 4 * self.grid.size_total:
+            self._rebuild_entropy_heap()
+
+        heap = self._entropy_heap
+        while heap:
+            entropy, index = heap[0]
+            if (
+                self.states[index].bit_count() > 1
+                and entropy == self.get_entropy(index) + self._entropy_noise[index]
+            ):
+                return index
+            heapq.heappop(heap)
+        raise ValueError('All cells are already collapsed')
+
+
+    def _on_tiles_removed(self, index: int, removed_tiles: int) -> None:
+        """Queues a reduced cell so that its neighbours can be constrained."""
+        self._enqueue(index)
+
+    def _on_tiles_restored(self, index: int, restored_tiles: int) -> None:
+        """Reverses any bookkeeping performed when the tiles were removed."""
+        pass
+
+
+
+class SupportCountingWaveFunction(BitsetWaveFunction):
+    """A bitset wave function which propagates by maintaining tile support counts (AC-4).
+
+    For every cell, constraint direction and tile, a counter records how many tiles in the
+    neighbouring cell allow that tile. Removing a tile only decrements the counters it contributed
+    to, and tiles are eliminated exactly when their support reaches zero, so the propagation cost
+    is proportional to the number of eliminations rather than to the size of the states.
+    """
+
+    def __init__(
+        self,
+        grid: grids.Grid,
+        tile_set: Sequence[Tile],
+        compatibility: TileCompatibility | None = None,
+        seed: int | None = None,
+    ):
+        super().__init__(grid, tile_set, compatibility, seed)
+
+        num_tiles = self.compatibility.num_tiles
+        self._supported_tiles = {
+            direction: [tuple(iterate_bits(mask)) for mask in allowed_neighbours]
+            for direction, allowed_neighbours in self.compatibility.allowed_neighbours.items()
+        }
+        self._support_offsets = {
+            direction: direction_index * num_tiles
+            for direction_index, direction in enumerate(grid.directions)
+        }
+        self._cell_stride = len(grid.directions) * num_tiles
+
+        # Supports are indexed by cell, then the direction the support acts in, then by tile
+        initial_supports = []
+        for direction in grid.directions:
+            direction_supports = [0] * num_tiles
+            for supported_tiles in self._supported_tiles[direction]:
+                for tile_index in supported_tiles:
+                    direction_supports[tile_index] += 1
+            initial_supports.extend(direction_supports)
+        self.supports = array('H' if num_tiles < 1 << 16 else 'L', initial_supports)
+        self.supports *= grid.size_total
+
+        self._pending_removals: dict[int, int] = {}
+
+
+    def clone(self, seed: int | None = None) -> Self:
+        clone = super().clone(seed)
+        clone.supports = self.supports[:]
+        clone._pending_removals = {}
+        return clone
+
+
+    def _clear_queue(self) -> None:
+        super()._clear_queue()
+        self._pending_removals.clear()
+
+
+    def _propagate_from(self, index: int) -> None:
+        """Removes the tiles in a queued cell which have lost all support."""
+
+        state = self.states[index]
+        constrained_state = state & ~self._pending_removals.pop(index)
+        if constrained_state != state:
+            self._set_state(index, constrained_state)
+
+
+    def _on_tiles_removed(self, index: int, removed_tiles: int) -> None:
+        """Withdraws the support of the removed tiles, queuing any tiles left unsupported."""
+
+        supports = self.supports
+        for direction, neighbour_table in self._neighbour_tables:
+            neighbour_index = neighbour_table[index]
+            if neighbour_index < 0:
+                continue
+            supported_tiles = self._supported_tiles[direction]
+            support_offset = neighbour_index * self._cell_stride + self._support_offsets[direction]
+            neighbour_state = self.states[neighbour_index]
+            unsupported = 0
+            for removed_index in iterate_bits(removed_tiles):
+                for tile_index in supported_tiles[removed_index]:
+                    support_index = support_offset + tile_index
+                    supports[support_index] -= 1
+                    if not supports[support_index]:
+                        unsupported |= 1 << tile_index
+
+            unsupported &= neighbour_state
+            if unsupported:
+                self._pending_removals[neighbour_index] = (
+                    self._pending_removals.get(neighbour_index, 0) | unsupported
+                )
+                self._enqueue(neighbour_index)
+
+
+    def _on_tiles_restored(self, index: int, restored_tiles: int) -> None:
+        """Reinstates the support provided by the restored tiles."""
+
+        supports = self.supports
+        for direction, neighbour_table in self._neighbour_tables:
+            neighbour_index = neighbour_table[index]
+            if neighbour_index < 0:
+                continue
+            supported_tiles = self._supported_tiles[direction]
+            support_offset = neighbour_index * self._cell_stride + self._support_offsets[direction]
+            for restored_index in iterate_bits(restored_tiles):
+                for tile_index in supported_tiles[restored_index]:
+                    supports[support_offset + tile_index] += 1
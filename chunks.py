@@ -0,0 +1,241 @@
+"""Generates unbounded worlds of tiles in fixed-size chunks, as and when they are requested."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence
+import hashlib
+
+import numpy as np
+import numpy.typing as npt
+from tile_sets import Tile, TileCompatibility, compile_compatibility
+from bitset_wave_functions import BitsetWaveFunction
+from solvers import BacktrackingSolver
+from wave_functions import Cell
+import grids
+
+
+CORNER_RADIUS = 2  # Cells either side of each corner of the seam lattice, collapsed with it
+
+
+def derive_seed(world_seed: int, *key: object) -> int:
+    """Derives a stable seed for part of the world, independent of the order it is generated in."""
+
+    digest = hashlib.blake2b(repr((world_seed, *key)).encode(), digest_size = 8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+@dataclass
+class Chunk:
+    x: int
+    y: int
+    tile_indices: npt.NDArray[np.intp]  # Indexed by [row, column] within the chunk
+
+
+class ChunkedWorld:
+    """An unbounded world of tiles, generated one square chunk at a time.
+
+    The rows and columns along chunk boundaries form a lattice of seams, seeded only by the world
+    seed and their position, so neighbouring chunks agree on the seams between them whatever order
+    they are generated in. A chunk owns its top and left seams and has its bottom and right edges
+    constrained by the seams owned by its neighbours, before its interior is collapsed.
+
+    Each corner of the lattice is collapsed as a square patch, together with the ends of the four
+    seams meeting there and the cells around it. Seams are then collapsed as strips between the
+    corners, as wide as the patches and fixed to them at each end. The cells along each seam, and
+    around each corner, therefore have consistent neighbours within the chunks either side, so
+    separately collapsed seams cannot leave the corners of a chunk interior contradictory.
+
+    Only the most recently used chunks are kept, with any others regenerated when next requested,
+    along with a proportionate number of corners and seams.
+    N.B. Chunk interiors must be completable within any consistent seams, which rules out tile
+    sets whose paths have to be closed (such as knots made only of corners and lines). Structures
+    spanning several seams, such as the chips of `Circuits`, can still very occasionally leave an
+    interior which cannot be completed (around one chunk in a thousand for its best subset).
+    """
+
+    def __init__(
+        self,
+        tile_set: Sequence[Tile],
+        chunk_size: int = 16,
+        seed: int = 0,
+        max_chunks: int = 64,
+        compatibility: TileCompatibility | None = None,
+        max_backtracks: int | None = 1000,
+        max_attempts: int = 8,
+    ):
+        assert chunk_size >= 2 * CORNER_RADIUS + 6, 'Chunks must leave room for seams to vary'
+        assert max_chunks >= 1
+        self.tiles = list(tile_set)
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.max_chunks = max_chunks
+        self.compatibility = (
+            compatibility if compatibility is not None else compile_compatibility(self.tiles)
+        )
+        self.max_backtracks = max_backtracks
+        self.max_attempts = max_attempts
+        self.chunks_generated = 0
+        self.corners_generated = 0
+        self.seams_generated = 0
+        self._chunks: OrderedDict[tuple[int, int], Chunk] = OrderedDict()
+        self._lattice: OrderedDict[tuple[object, ...], list[int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+
+    def get_chunk(self, chunk_x: int, chunk_y: int) -> Chunk:
+        """Returns the chunk at the chunk coordinates given, generating it if it is not held."""
+
+        chunk = self._chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            chunk = self._chunks[chunk_x, chunk_y] = self.generate_chunk(chunk_x, chunk_y)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last = False)
+        else:
+            self._chunks.move_to_end((chunk_x, chunk_y))
+        return chunk
+
+
+    def tile_at(self, x: int, y: int) -> Tile:
+        chunk_x, column = divmod(x, self.chunk_size)
+        chunk_y, row = divmod(y, self.chunk_size)
+        return self.tiles[int(self.get_chunk(chunk_x, chunk_y).tile_indices[row, column])]
+
+
+    def generate_chunk(self, chunk_x: int, chunk_y: int) -> Chunk:
+        """Collapses the chunk at the chunk coordinates given, within the seams around it."""
+
+        size = self.chunk_size
+        grid = grids.Grid2D(size, size, False, False)
+        top_seam = self._get_seam(chunk_x, chunk_y, 'x')[:size]
+        left_seam = self._get_seam(chunk_x, chunk_y, 'y')[:size]
+        right_seam = self._get_seam(chunk_x + 1, chunk_y, 'y')[:size]
+        bottom_seam = self._get_seam(chunk_x, chunk_y + 1, 'x')[:size]
+
+        fixed_tiles = {
+            **dict(enumerate(top_seam)),
+            **{row * size: tile_index for row, tile_index in enumerate(left_seam)},
+        }
+        constraints = [
+            (row * size + size - 1, grids.Direction.LEFT, tile_index)
+            for row, tile_index in enumerate(right_seam)
+        ] + [
+            (size * (size - 1) + column, grids.Direction.UP, tile_index)
+            for column, tile_index in enumerate(bottom_seam)
+        ]
+
+        tile_indices = self._collapse(grid, fixed_tiles, constraints, ('chunk', chunk_x, chunk_y))
+        self.chunks_generated += 1
+        return Chunk(chunk_x, chunk_y, np.array(tile_indices, dtype = np.intp).reshape(size, size))
+
+
+    def _get_corner(self, corner_x: int, corner_y: int) -> list[int]:
+        """Collapses the square patch of tiles centred on a corner of the seam lattice.
+
+        The patch is collapsed with a margin of cells around it, which is then discarded.
+        """
+
+        key = ('corner', corner_x, corner_y)
+        if key in self._lattice:
+            return self._recall(key)
+
+        width = 2 * CORNER_RADIUS + 1
+        grid = grids.Grid2D(width + 2, width + 2, False, False)
+        tile_indices = self._collapse(grid, {}, [], key)
+        self.corners_generated += 1
+        return self._remember(key, [
+            tile_indices[row * (width + 2) + column]
+            for row in range(1, width + 1) for column in range(1, width + 1)
+        ])
+
+
+    def _get_seam(self, corner_x: int, corner_y: int, axis: str) -> list[int]:
+        """Collapses the seam running along an axis from a corner to the next, including both.
+
+        The seam is collapsed as a strip as wide as the corner patches, so that it is consistent
+        across its width as well as along its length, before the rows either side are discarded.
+        The cells covered by the corner patches at either end are fixed to match them.
+        """
+
+        key = ('seam', axis, corner_x, corner_y)
+        if key in self._lattice:
+            return self._recall(key)
+
+        size, radius = self.chunk_size, CORNER_RADIUS
+        width = 2 * radius + 1
+        if axis == 'x':
+            grid = grids.Grid2D(size + 1, width, False, False)
+            end_corner = (corner_x + 1, corner_y)
+        else:
+            grid = grids.Grid2D(width, size + 1, False, False)
+            end_corner = (corner_x, corner_y + 1)
+
+        def get_index(along: int, across: int) -> int:
+            """Locates a cell in the strip by its offsets along and across the seam."""
+
+            across += radius
+            return across * (size + 1) + along if axis == 'x' else along * width + across
+
+        fixed_tiles = {}
+        for position, patch in [
+            (0, self._get_corner(corner_x, corner_y)),
+            (size, self._get_corner(*end_corner)),
+        ]:
+            for along in range(max(-position, -radius), min(size - position, radius) + 1):
+                for across in range(-radius, radius + 1):
+                    row, column = (across, along) if axis == 'x' else (along, across)
+                    patch_index = (row + radius) * width + column + radius
+                    fixed_tiles[get_index(position + along, across)] = patch[patch_index]
+
+        tile_indices = self._collapse(grid, fixed_tiles, [], key)
+        self.seams_generated += 1
+        seam = [tile_indices[get_index(along, 0)] for along in range(size + 1)]
+        return self._remember(key, seam)
+
+
+    def _recall(self, key: tuple[object, ...]) -> list[int]:
+        self._lattice.move_to_end(key)
+        return self._lattice[key]
+
+    def _remember(self, key: tuple[object, ...], tile_indices: list[int]) -> list[int]:
+        """Holds part of the seam lattice, for as long as it may be needed by the held chunks."""
+
+        self._lattice[key] = tile_indices
+        while len(self._lattice) > 8 * self.max_chunks:
+            self._lattice.popitem(last = False)
+        return tile_indices
+
+
+    def _collapse(
+        self,
+        grid: grids.Grid,
+        fixed_tiles: dict[int, int],
+        constraints: list[tuple[int, grids.Direction, int]],
+        key: tuple[object, ...],
+    ) -> list[int]:
+        """Collapses a grid around fixed tiles and tiles constraining cells from outside the grid.
+
+        Each constraint holds a cell, the direction the constraint acts in and the tile it is from.
+        """
+
+        for attempt in range(self.max_attempts):
+            wave_function = BitsetWaveFunction(
+                grid,
+                self.tiles,
+                self.compatibility,
+                derive_seed(self.seed, *key, attempt),
+            )
+            try:
+                wave_function.apply_constraints(
+                    [
+                        (index, direction, {self.tiles[tile_index].connectors[direction]})
+                        for index, direction, tile_index in constraints
+                    ],
+                    {index: self.tiles[tile_index] for index, tile_index in fixed_tiles.items()},
+                )
+                BacktrackingSolver(wave_function, self.max_backtracks).run()
+            except Cell.ConstraintError:
+                continue
+            return [state.bit_length() - 1 for state in wave_function.states]
+
+        raise Cell.ConstraintError(f'Unable to collapse {key} in {self.max_attempts} attempts')
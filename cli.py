@@ -1,13 +1,18 @@
-import random
-
 from tile_sets import Tile
+import bitset_wave_functions
 import wave_functions
+import solvers
 
 
 class CliRunner():
 
-    def __init__(self, wave_function: wave_functions.WaveFunction):
+    def __init__(
+        self,
+        wave_function: wave_functions.WaveFunctionLike,
+        max_backtracks: int | None = None,
+    ):
         self.wave_function = wave_function
+        self.max_backtracks = max_backtracks
 
     def render_state(self) -> None:
         pass
@@ -21,11 +26,20 @@ class CliRunner():
         print('Initial state')
         self.render_state()
 
+        # Only engines with a trail can backtrack, others are collapsed directly
+        if not isinstance(self.wave_function, bitset_wave_functions.BitsetWaveFunction):
+            while not self.wave_function.collapsed:
+                cell = self.wave_function.get_most_constrained_cell()
+                tile = self.wave_function.choose_tile(cell)
+                print(f'Selected [{self.inline_tile_string(tile)}] in {cell}')
+                cell.tile = tile
+                self.render_state()
+            return
+
+        solver = solvers.BacktrackingSolver(self.wave_function, self.max_backtracks)
         while not self.wave_function.collapsed:
-            cell = self.wave_function.get_most_constrained_cell()
-            tile = random.choice(cell.state)
+            cell, tile = solver.step()
             print(f'Selected [{self.inline_tile_string(tile)}] in {cell}')
-
-            cell.tile = tile
             self.render_state()
 
+        print(f'Collapsed with {solver.stats.backtracks} backtracks')
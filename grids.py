@@ -1,5 +1,8 @@
+from array import array
 from typing import Protocol
 import enum
+import itertools
+import math
 
 
 class Direction(enum.Enum):
@@ -8,6 +11,16 @@ class Direction(enum.Enum):
     UP = 'U'
     DOWN = 'D'
 
+    # Hexagonal grids replace UP and DOWN with these diagonals
+    UP_LEFT = 'UL'
+    UP_RIGHT = 'UR'
+    DOWN_LEFT = 'DL'
+    DOWN_RIGHT = 'DR'
+
+    # Three dimensional grids add the depth axis
+    FORWARD = 'F'
+    BACKWARD = 'B'
+
     def __repr__(self) -> str:
         return self.value
 
@@ -20,9 +33,18 @@ def flip_direction(direction: Direction) -> Direction:
         Direction.UP: Direction.DOWN,
         Direction.RIGHT: Direction.LEFT,
         Direction.DOWN: Direction.UP,
+        Direction.UP_LEFT: Direction.DOWN_RIGHT,
+        Direction.UP_RIGHT: Direction.DOWN_LEFT,
+        Direction.DOWN_LEFT: Direction.UP_RIGHT,
+        Direction.DOWN_RIGHT: Direction.UP_LEFT,
+        Direction.FORWARD: Direction.BACKWARD,
+        Direction.BACKWARD: Direction.FORWARD,
     }[direction]
 
 
+NeighbourTables = dict[Direction, memoryview]  # Read-only views of 'q' arrays
+
+
 class Grid(Protocol):
 
     size_x: int
@@ -30,51 +52,125 @@ class Grid(Protocol):
     size_total: int
     cyclic_x: bool
     cyclic_y: bool
+    shape: tuple[int, ...]  # Ordered with the slowest changing axis first, as for NumPy arrays
+    directions: tuple[Direction, ...]
 
     def make_cell_id(self, index: int) -> str:
         pass
 
-    def get_boundary_slice(self, direction: Direction) -> slice:
+    def get_neighbour_tables(self) -> NeighbourTables:
         pass
 
-    def get_neighbour_slices(self) -> list[tuple[slice, Direction, bool]]:
-        pass
+
+def get_boundary_indices(grid: Grid, direction: Direction) -> list[int]:
+    """Finds the cells on the boundary of the grid in the direction given, if it is not cyclic."""
+
+    neighbour_table = grid.get_neighbour_tables()[direction]
+    return [index for index, neighbour_index in enumerate(neighbour_table) if neighbour_index < 0]
+
+
+def _shift_axis(size: int, offset: int, cyclic: bool) -> list[int]:
+    """Offsets every position along an axis, wrapping if it is cyclic or else marking it -1."""
+
+    return [
+        (position + offset) % size if cyclic or 0 <= position + offset < size else -1
+        for position in range(size)
+    ]
+
+
+def _make_neighbour_tables(
+    shape: tuple[int, ...],
+    cyclic: tuple[bool, ...],
+    offsets: dict[Direction, tuple[int, ...]],
+) -> NeighbourTables:
+    """Builds flat, read-only neighbour tables by offsetting the position of each cell.
+
+    The shape, cyclic flags and offsets are all ordered with the slowest changing axis first.
+    Along the fastest changing axis the neighbours form runs of consecutive indices, broken only
+    where they wrap or leave the grid, so each row is copied a run at a time from the indices.
+    """
+
+    strides = [math.prod(shape[axis + 1:]) for axis in range(len(shape))]
+    indices = array('q', range(math.prod(shape)))
+    neighbour_tables = {}
+    for direction, offset in offsets.items():
+        *outer_axes, inner_axis = map(_shift_axis, shape, offset, cyclic)
+
+        # Group the inner positions into runs, with a start of -1 for missing neighbours
+        runs: list[list[int]] = []
+        for position in inner_axis:
+            if runs and (position < 0 if runs[-1][0] < 0 else position == sum(runs[-1])):
+                runs[-1][1] += 1
+            else:
+                runs.append([position, 1])
+
+        neighbour_table = array('q')
+        missing_row = array('q', [-1]) * shape[-1]
+        for positions in itertools.product(*outer_axes):
+            if -1 in positions:
+                neighbour_table.extend(missing_row)
+                continue
+            row_start = sum(position * stride for position, stride in zip(positions, strides))
+            for run_start, run_length in runs:
+                if run_start < 0:
+                    neighbour_table.extend(missing_row[:run_length])
+                else:
+                    run_start += row_start
+                    neighbour_table.extend(indices[run_start:run_start + run_length])
+        neighbour_tables[direction] = memoryview(neighbour_table).toreadonly()
+    return neighbour_tables
 
 
 class Grid1D():
 
+    directions: tuple[Direction, ...] = (Direction.LEFT, Direction.RIGHT)
+
     def __init__(self, size_x: int, cyclic_x: bool) -> None:
         self.size_x = size_x
         self.size_y = 1
         self.size_total = size_x
+        self.shape: tuple[int, ...] = (size_x,)
         self.cyclic_x = cyclic_x
         self.cyclic_y = False
+        self._neighbour_tables: NeighbourTables | None = None
 
 
     def make_cell_id(self, index: int) -> str:
         return str(index + 1)
 
 
-    def get_boundary_slice(self, direction: Direction) -> slice:
-        return {
-            Direction.LEFT: slice(0, 1),
-            Direction.RIGHT: slice(self.size_x - 1, self.size_x),
-        }[direction]
+    def get_neighbour_tables(self) -> NeighbourTables:
+        """Maps each direction to the index of the neighbour of every cell, or -1 for none."""
 
-
-    def get_neighbour_slices(self) -> list[tuple[slice, Direction, bool]]:
-        return [(slice(0, self.size_x), Direction.RIGHT, self.cyclic_x)]
+        if self._neighbour_tables is None:
+            self._neighbour_tables = _make_neighbour_tables(
+                self.shape,
+                (self.cyclic_x,),
+                {Direction.LEFT: (-1,), Direction.RIGHT: (1,)},
+            )
+        return self._neighbour_tables
 
 
 class Grid2D():
 
+    # Offsets to each neighbour, as (row, column)
+    direction_offsets: dict[Direction, tuple[int, ...]] = {
+        Direction.LEFT: (0, -1),
+        Direction.RIGHT: (0, 1),
+        Direction.UP: (-1, 0),
+        Direction.DOWN: (1, 0),
+    }
+    directions: tuple[Direction, ...] = tuple(direction_offsets)
+
     def __init__(self, size_x: int, size_y: int, cyclic_x: bool, cyclic_y: bool) -> None:
         self.size_x = size_x
         self.size_y = size_y
         self.size_total = size_x * size_y
+        self.shape: tuple[int, ...] = (size_y, size_x)
 
         self.cyclic_x = cyclic_x
         self.cyclic_y = cyclic_y
+        self._neighbour_tables: NeighbourTables | None = None
 
 
     def make_cell_id(self, index: int) -> str:
@@ -83,23 +179,84 @@ class Grid2D():
         return f'{x_pos + 1}-{y_pos + 1}'
 
 
-    def get_boundary_slice(self, direction: Direction) -> slice:
-        return {
-            Direction.LEFT: slice(0, self.size_total, self.size_x),
-            Direction.UP: slice(0, self.size_x),
-            Direction.RIGHT: slice(self.size_x - 1, self.size_total, self.size_x),
-            Direction.DOWN: slice(self.size_x * (self.size_y - 1), self.size_total),
-        }[direction]
+    def get_neighbour_tables(self) -> NeighbourTables:
+        """Maps each direction to the index of the neighbour of every cell, or -1 for none."""
+
+        if self._neighbour_tables is None:
+            self._neighbour_tables = _make_neighbour_tables(
+                self.shape,
+                (self.cyclic_y, self.cyclic_x),
+                self.direction_offsets,
+            )
+        return self._neighbour_tables
+
+
+class GridHex(Grid2D):
+    """A grid of pointy-topped hexagons, indexed by axial coordinates over a parallelogram.
+
+    Each row is offset half a cell to the right of the row above, so that moving up keeps a cell
+    either up and to the left, or up and to the right. Wrapping either axis gives a cylinder, or a
+    torus when both wrap.
+    """
+
+    direction_offsets: dict[Direction, tuple[int, ...]] = {
+        Direction.LEFT: (0, -1),
+        Direction.RIGHT: (0, 1),
+        Direction.UP_LEFT: (-1, 0),
+        Direction.UP_RIGHT: (-1, 1),
+        Direction.DOWN_LEFT: (1, -1),
+        Direction.DOWN_RIGHT: (1, 0),
+    }
+    directions: tuple[Direction, ...] = tuple(direction_offsets)
+
+
+class Grid3D():
+
+    # Offsets to each neighbour, as (layer, row, column)
+    direction_offsets: dict[Direction, tuple[int, ...]] = {
+        Direction.LEFT: (0, 0, -1),
+        Direction.RIGHT: (0, 0, 1),
+        Direction.UP: (0, -1, 0),
+        Direction.DOWN: (0, 1, 0),
+        Direction.BACKWARD: (-1, 0, 0),
+        Direction.FORWARD: (1, 0, 0),
+    }
+    directions: tuple[Direction, ...] = tuple(direction_offsets)
+
+    def __init__(
+        self,
+        size_x: int,
+        size_y: int,
+        size_z: int,
+        cyclic_x: bool,
+        cyclic_y: bool,
+        cyclic_z: bool,
+    ) -> None:
+        self.size_x = size_x
+        self.size_y = size_y
+        self.size_z = size_z
+        self.size_total = size_x * size_y * size_z
+        self.shape: tuple[int, ...] = (size_z, size_y, size_x)
+
+        self.cyclic_x = cyclic_x
+        self.cyclic_y = cyclic_y
+        self.cyclic_z = cyclic_z
+        self._neighbour_tables: NeighbourTables | None = None
+
+
+    def make_cell_id(self, index: int) -> str:
+        z_pos, remainder = divmod(index, self.size_x * self.size_y)
+        y_pos, x_pos = divmod(remainder, self.size_x)
+        return f'{x_pos + 1}-{y_pos + 1}-{z_pos + 1}'
 
 
-    def get_neighbour_slices(self) -> list[tuple[slice, Direction, bool]]:
-        horizontal_neighbours = [
-            (slice(self.size_x * j, self.size_x * (j + 1)), Direction.RIGHT, self.cyclic_x)
-            for j in range(self.size_y)
-        ]
-        vertical_neighbours = [
-            (slice(i, self.size_total, self.size_x), Direction.DOWN, self.cyclic_y)
-            for i in range(self.size_x)
-        ]
-        return horizontal_neighbours + vertical_neighbours
+    def get_neighbour_tables(self) -> NeighbourTables:
+        """Maps each direction to the index of the neighbour of every cell, or -1 for none."""
 
+        if self._neighbour_tables is None:
+            self._neighbour_tables = _make_neighbour_tables(
+                self.shape,
+                (self.cyclic_z, self.cyclic_y, self.cyclic_x),
+                self.direction_offsets,
+            )
+        return self._neighbour_tables
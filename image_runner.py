@@ -1,51 +1,32 @@
-from typing import cast
-from functools import lru_cache
-import random
-
-from PIL import Image as pillow
-from tile_sets import ImageTile, ImageTileSet, GreenKnots, Circles, Circuits
-import wave_functions
+from tile_sets import ImageTileSet, GreenKnots, Circles, Circuits
+import bitset_wave_functions
+import renderers
+import solvers
 import grids
 
 
-StateTuple = tuple[ImageTile]
-
-
-@lru_cache
-def _render_state_vector(state: StateTuple, images_size: tuple[int, int]) -> pillow.Image:
-    avg = pillow.new('RGB', images_size)
-    for count, tile in enumerate(state):
-        avg = pillow.blend(avg, tile.image, 1. / (1. + count))
-    return avg
+def generate_wave_function_image(renderer: renderers.CanvasRenderer) -> None:
+    renderer.render().show()
 
 
-def generate_wave_function_image(
-    wave_function: wave_functions.WaveFunction,
-    images_size: tuple[int, int],
-) -> None:
-
-    output_grid_size = (
-        wave_function.grid.size_x + 2 * wave_function.grid.cyclic_x,
-        wave_function.grid.size_y + 2 * wave_function.grid.cyclic_y,
-    )
-
-    output_image_size = (
-        output_grid_size[0] * images_size[0],
-        output_grid_size[1] * images_size[1],
+def create_wave_function(
+    tile_set: ImageTileSet,
+    grid: grids.Grid,
+    seed: int | None = None,
+) -> bitset_wave_functions.BitsetWaveFunction:
+    """Builds a wave function over the grid, constraining any non-cyclic boundaries."""
+
+    wave_function = bitset_wave_functions.BitsetWaveFunction(
+        grid,
+        tile_set.tiles,
+        tile_set.compatibility,
+        seed,
     )
-    output_image = pillow.new('RGB', output_image_size)
 
-    for img_row in range(0, output_grid_size[0]):
-        for img_col in range(0, output_grid_size[1]):
-            grid_row = (img_row - wave_function.grid.cyclic_x) % wave_function.grid.size_x
-            grid_col = (img_col - wave_function.grid.cyclic_y) % wave_function.grid.size_y
-            cell = wave_function.cells[grid_row + grid_col * wave_function.grid.size_x]
-            output_image.paste(
-                _render_state_vector(cast(StateTuple, tuple(cell.state)), images_size),
-                (img_row * images_size[0], img_col * images_size[1]),
-            )
+    for direction in grid.directions:  # Cyclic axes have no boundary cells to constrain
+        wave_function.apply_boundary_constraint(direction, {tile_set.boundary_connector})
 
-    output_image.show()
+    return wave_function
 
 
 def main(
@@ -53,28 +34,30 @@ def main(
     grid_size: tuple[int, int],
     cyclic: bool = False,
     display_every: int | None = None,
+    max_backtracks: int | None = 1000,
+    seed: int | None = None,
+    render_cache: renderers.RenderCache | None = None,
 ) -> None:
 
     grid = grids.Grid2D(*grid_size, *(cyclic, cyclic))
+    wave_function = create_wave_function(tile_set, grid, seed)
+    renderer = renderers.CanvasRenderer(
+        renderers.AtlasRenderer(tile_set, render_cache),
+        wave_function,
+    )
 
-    wave_function = wave_functions.WaveFunction(grid, tile_set.tiles)
-    if not cyclic:
-        for direction in grids.Direction:
-            wave_function.apply_boundary_constraint(direction, {tile_set.boundary_connector})
-
-    for i in range(grid.size_total):  # Iterations required ≤ Total number of grid cells
-        if display_every and not i % display_every:
-            generate_wave_function_image(wave_function, tile_set.images_size)
+    solver = solvers.BacktrackingSolver(wave_function, max_backtracks)
+    iteration = 0
+    while not wave_function.collapsed:
+        if display_every and not iteration % display_every:
+            generate_wave_function_image(renderer)
 
-        cell = wave_function.get_most_constrained_cell()
-        tile = random.choice(cell.state)
+        cell, tile = solver.step()
         print(f'Selected [{tile.id}] in {cell}')
-        cell.tile = tile
-
-        if wave_function.collapsed:
-            break
+        iteration += 1
 
-    generate_wave_function_image(wave_function, tile_set.images_size)
+    print(f'Collapsed with {solver.stats.backtracks} backtracks')
+    generate_wave_function_image(renderer)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,166 @@
+"""Generates images pixel by pixel from the overlapping NxN patterns found in a sample image.
+
+Each cell of the wave function holds one pattern, and neighbouring cells may only hold patterns
+which agree wherever they overlap. Agreement between neighbours along each axis is enough to make
+every pattern agree with all of the patterns it overlaps, so the grid is rendered from the top
+left pixel of the pattern in each cell.
+"""
+from PIL import Image as pillow
+import numpy as np
+import numpy.typing as npt
+from tile_sets import Tile, TileCompatibility
+from bitset_wave_functions import BitsetWaveFunction
+from renderers import masks_to_matrix
+import grids
+
+
+def index_colours(
+    sample: pillow.Image,
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.int64]]:
+    """Splits an image into its distinct colours and the index of the colour of each pixel."""
+
+    pixels = np.asarray(sample.convert('RGB'), dtype = np.uint8)
+    packed_pixels = pixels.astype(np.uint32) @ np.array([1 << 16, 1 << 8, 1], dtype = np.uint32)
+    packed_colours, colour_indices = np.unique(packed_pixels, return_inverse = True)
+    colours = (packed_colours[:, None] >> np.array([16, 8, 0], dtype = np.uint32)).astype(np.uint8)
+    return colours, colour_indices.reshape(pixels.shape[:2])
+
+
+def extract_patterns(
+    colour_indices: npt.NDArray[np.int64],
+    pattern_size: int = 3,
+    rotations: bool = False,
+    reflections: bool = False,
+    periodic: bool = True,
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+    """Finds each distinct pattern in an image of colour indices, along with its frequency.
+
+    The image is rotated and reflected as a whole, which yields the same patterns as transforming
+    each pattern in turn. Patterns are deduplicated on an integer key packing their colours, which
+    is computed for every position at once from shifted views of the image.
+    """
+
+    num_colours = int(colour_indices.max()) + 1
+    num_pixels = pattern_size ** 2
+    if num_colours ** num_pixels > 2**63:
+        raise ValueError(f'{num_colours} colours are too many for {pattern_size}px patterns')
+    place_values = num_colours ** np.arange(num_pixels, dtype = np.int64)
+
+    variants = [colour_indices]
+    if rotations:
+        variants += [np.rot90(colour_indices, turns) for turns in range(1, 4)]
+    if reflections:
+        variants += [np.fliplr(variant) for variant in variants]
+
+    all_keys = []
+    for variant in variants:
+        if periodic:
+            variant = np.pad(variant, ((0, pattern_size - 1),) * 2, mode = 'wrap')
+        height, width = (axis_size - pattern_size + 1 for axis_size in variant.shape)
+        keys = np.zeros((height, width), dtype = np.int64)
+        for pixel, place_value in enumerate(place_values.tolist()):
+            row, column = divmod(pixel, pattern_size)
+            keys += variant[row:row + height, column:column + width] * place_value
+        all_keys.append(keys.ravel())
+
+    unique_keys, counts = np.unique(np.concatenate(all_keys), return_counts = True)
+    patterns = unique_keys[:, None] // place_values % num_colours
+    return patterns.reshape(-1, pattern_size, pattern_size), counts
+
+
+def compile_overlaps(
+    patterns: npt.NDArray[np.int64],
+    direction_offsets: dict[grids.Direction, tuple[int, ...]] = grids.Grid2D.direction_offsets,
+) -> TileCompatibility:
+    """Allows each pattern alongside the patterns which agree with it where they overlap.
+
+    The overlapping region of every pattern is looked up in a hash index of the regions of the
+    other patterns, so each direction takes time proportional to the number of patterns.
+    """
+
+    pattern_size = patterns.shape[1]
+
+    def crop(row_offset: int, column_offset: int) -> list[bytes]:
+        region = patterns[
+            :,
+            max(row_offset, 0):pattern_size + min(row_offset, 0),
+            max(column_offset, 0):pattern_size + min(column_offset, 0),
+        ]
+        return [pattern_region.tobytes() for pattern_region in region]
+
+    allowed_neighbours: dict[grids.Direction, tuple[int, ...]] = {}
+    for direction, (row_offset, column_offset) in direction_offsets.items():
+        neighbour_masks: dict[bytes, int] = {}
+        for neighbour_index, region in enumerate(crop(-row_offset, -column_offset)):
+            neighbour_masks[region] = neighbour_masks.get(region, 0) | 1 << neighbour_index
+        allowed_neighbours[direction] = tuple(
+            neighbour_masks.get(region, 0) for region in crop(row_offset, column_offset)
+        )
+
+    return TileCompatibility(len(patterns), allowed_neighbours)
+
+
+class OverlappingModel:
+    """The patterns of a sample image, as weighted tiles which can be collapsed over a grid."""
+
+    def __init__(
+        self,
+        sample: pillow.Image,
+        pattern_size: int = 3,
+        rotations: bool = False,
+        reflections: bool = False,
+        periodic_sample: bool = True,
+    ):
+        self.pattern_size = pattern_size
+        self.colours, colour_indices = index_colours(sample)
+        self.patterns, counts = extract_patterns(
+            colour_indices, pattern_size, rotations, reflections, periodic_sample,
+        )
+        self.tiles = [
+            Tile(f'pattern-{index}', {}, weight = float(count))
+            for index, count in enumerate(counts.tolist())
+        ]
+        self.compatibility = compile_overlaps(self.patterns)
+
+
+    def create_wave_function(
+        self,
+        grid: grids.Grid2D,
+        seed: int | None = None,
+    ) -> BitsetWaveFunction:
+        assert grid.directions == grids.Grid2D.directions, 'Patterns only overlap on square grids'
+        return BitsetWaveFunction(grid, self.tiles, self.compatibility, seed)
+
+
+    def render(self, wave_function: BitsetWaveFunction) -> pillow.Image:
+        """Composes the image of the wave function, showing superpositions as mean colours.
+
+        Non-cyclic axes are extended by the rest of the patterns in the cells along their far
+        edge, so that the image covers every pixel of every pattern.
+        """
+
+        grid = wave_function.grid
+        pattern_colours = self.colours[self.patterns].astype(np.float32)
+
+        # Find the mean of the patterns for each distinct state
+        unique_states: dict[int, int] = {}
+        state_indices = np.array([
+            unique_states.setdefault(state, len(unique_states)) for state in wave_function.states
+        ], dtype = np.intp).reshape(grid.size_y, grid.size_x)
+        weights = masks_to_matrix(list(unique_states), len(self.patterns)).astype(np.float32)
+        weights /= weights.sum(axis = 1, keepdims = True)
+        state_colours = np.tensordot(weights, pattern_colours, axes = 1)
+
+        # Take each pixel from the nearest cell whose pattern covers it
+        extension = self.pattern_size - 1
+        rows = np.arange(grid.size_y + (0 if grid.cyclic_y else extension))
+        columns = np.arange(grid.size_x + (0 if grid.cyclic_x else extension))
+        cell_rows = np.minimum(rows, grid.size_y - 1)
+        cell_columns = np.minimum(columns, grid.size_x - 1)
+        pixels = state_colours[
+            state_indices[cell_rows[:, None], cell_columns[None, :]],
+            (rows - cell_rows)[:, None],
+            (columns - cell_columns)[None, :],
+        ]
+        return pillow.fromarray(np.rint(pixels).astype(np.uint8))
+
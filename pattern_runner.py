@@ -0,0 +1,70 @@
+"""Generates images from the overlapping patterns of a sample image, pixel by pixel.
+
+Example:
+    python pattern_runner.py sample.png 64 64 --rotations --reflections --output output/out.png
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+import time
+
+from PIL import Image as pillow
+from overlapping import OverlappingModel
+from wave_functions import Cell
+import solvers
+import grids
+
+
+def main() -> None:
+
+    parser = ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('sample', type = Path)
+    parser.add_argument('size_x', type = int)
+    parser.add_argument('size_y', type = int)
+    parser.add_argument('--pattern-size', type = int, default = 3)
+    parser.add_argument('--rotations', action = 'store_true')
+    parser.add_argument('--reflections', action = 'store_true')
+    parser.add_argument('--bounded-sample', action = 'store_true', help = 'do not wrap the sample')
+    parser.add_argument('--cyclic', action = 'store_true')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--max-backtracks', type = int, default = 1000)
+    parser.add_argument('--scale', type = int, default = 1, help = 'enlarge the output pixels')
+    parser.add_argument('--output', type = Path, default = Path('output/patterns.png'))
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    with pillow.open(args.sample) as sample:
+        model = OverlappingModel(
+            sample,
+            args.pattern_size,
+            args.rotations,
+            args.reflections,
+            not args.bounded_sample,
+        )
+    print(f'Extracted {len(model.tiles)} patterns in {time.perf_counter() - start_time:.3f}s')
+
+    start_time = time.perf_counter()
+    grid = grids.Grid2D(args.size_x, args.size_y, args.cyclic, args.cyclic)
+    wave_function = model.create_wave_function(grid, args.seed)
+    try:
+        stats = solvers.BacktrackingSolver(wave_function, args.max_backtracks).run()
+    except Cell.ConstraintError as error:
+        print(f'Failed after {time.perf_counter() - start_time:.1f}s: {error}')
+        return
+    print(
+        f'Collapsed in {time.perf_counter() - start_time:.1f}s '
+        f'({stats.backtracks} backtracks)',
+    )
+
+    image = model.render(wave_function)
+    if args.scale > 1:
+        image = image.resize(
+            (image.width * args.scale, image.height * args.scale),
+            pillow.Resampling.NEAREST,
+        )
+    args.output.parent.mkdir(parents = True, exist_ok = True)
+    image.save(args.output)
+    print(f'Saved {args.output}')
+
+
+if __name__ == '__main__':
+    main()
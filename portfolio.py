@@ -0,0 +1,144 @@
+"""Runs independent, seeded collapse attempts in parallel and keeps the first to succeed.
+
+Each worker process builds its own tile set, grid and boundary constrained wave function, then
+repeatedly attempts a collapse on a clone of it with a limited backtracking budget, restarting
+with a fresh seed whenever the budget is exhausted. Only the collapsed tile indices are returned
+to the parent, so no images are loaded or rendered in the workers.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import Manager
+from threading import Event
+import os
+import random
+import time
+
+from tile_sets import ImageTileSet, Circuits
+from bitset_wave_functions import BitsetWaveFunction
+from solvers import BacktrackingSolver
+from wave_functions import Cell
+import image_runner
+import grids
+
+
+STOP_CHECK_INTERVAL = 256  # Decisions between checks for another worker having succeeded
+
+
+@dataclass
+class PortfolioSpec:
+    tile_set_type: type[ImageTileSet]
+    tile_types: list[ImageTileSet.TileTypes]
+    grid_size: tuple[int, int]
+    cyclic: bool = False
+    max_backtracks: int | None = 100
+    max_attempts: int | None = None
+
+
+@dataclass
+class WorkerReport:
+    worker: int
+    seed: int
+    attempts: int = 0
+    contradictions: int = 0
+    backtracks: int = 0
+    duration: float = 0.
+    tile_indices: list[int] | None = field(default = None, repr = False)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.tile_indices is not None
+
+
+@dataclass
+class PortfolioResult:
+    wave_function: BitsetWaveFunction | None
+    reports: list[WorkerReport]  # One for each worker, including any cancelled before starting
+    winner: int | None = None  # The worker whose collapse was kept
+
+
+def create_wave_function(
+    spec: PortfolioSpec,
+    tile_set: ImageTileSet,
+    seed: int | None = None,
+) -> BitsetWaveFunction:
+    """Builds a wave function for the spec, with the boundary constraints already applied."""
+
+    grid = grids.Grid2D(*spec.grid_size, *(spec.cyclic, spec.cyclic))
+    return image_runner.create_wave_function(tile_set, grid, seed)
+
+
+def _run_worker(spec: PortfolioSpec, worker: int, seed: int, stop_event: Event) -> WorkerReport:
+    """Attempts collapses until one succeeds, the attempts run out or another worker succeeds."""
+
+    start_time = time.perf_counter()
+    report = WorkerReport(worker, seed)
+    template = create_wave_function(spec, spec.tile_set_type(spec.tile_types))
+    seed_generator = random.Random(seed)
+
+    while spec.max_attempts is None or report.attempts < spec.max_attempts:
+        report.attempts += 1
+        wave_function = template.clone(seed_generator.getrandbits(64))
+        solver = BacktrackingSolver(wave_function, spec.max_backtracks)
+        try:
+            while not wave_function.collapsed:
+                solver.step()
+                if not solver.stats.decisions % STOP_CHECK_INTERVAL and stop_event.is_set():
+                    break
+            succeeded = wave_function.collapsed
+        except Cell.ConstraintError:
+            succeeded = False  # The cells may all be collapsed, but not consistently
+
+        report.contradictions += solver.stats.contradictions
+        report.backtracks += solver.stats.backtracks
+        if succeeded:
+            report.tile_indices = [state.bit_length() - 1 for state in wave_function.states]
+            break
+        if stop_event.is_set():
+            break
+
+    report.duration = time.perf_counter() - start_time
+    return report
+
+
+def solve(spec: PortfolioSpec, num_workers: int | None = None, seed: int = 0) -> PortfolioResult:
+    """Races seeded workers against each other, returning the first successful collapse."""
+
+    num_workers = num_workers or os.cpu_count() or 1
+    reports = {worker: WorkerReport(worker, seed + worker) for worker in range(num_workers)}
+    winner = tile_indices = None
+
+    with Manager() as manager, ProcessPoolExecutor(num_workers) as executor:
+        stop_event = manager.Event()
+        futures = [
+            executor.submit(_run_worker, spec, worker, report.seed, stop_event)
+            for worker, report in reports.items()
+        ]
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            report = future.result()
+            reports[report.worker] = report
+            if report.tile_indices is not None and tile_indices is None:
+                winner, tile_indices = report.worker, report.tile_indices
+                stop_event.set()
+                for pending_future in futures:
+                    pending_future.cancel()
+
+    if tile_indices is None:
+        return PortfolioResult(None, list(reports.values()))
+
+    # Replay the successful collapse into a local wave function
+    tile_set = spec.tile_set_type(spec.tile_types)
+    wave_function = create_wave_function(spec, tile_set)
+    for index, tile_index in enumerate(tile_indices):
+        if not wave_function.cells[index].collapsed:
+            wave_function.collapse(index, tile_set.tiles[tile_index])
+    return PortfolioResult(wave_function, list(reports.values()), winner)
+
+
+if __name__ == '__main__':
+
+    result = solve(PortfolioSpec(Circuits, list(Circuits.TileTypes), (64, 64)), num_workers = 4)
+    for report in result.reports:
+        print(report)
+    print('Succeeded' if result.wave_function else 'All workers failed')
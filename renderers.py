@@ -0,0 +1,230 @@
+"""Composes wave function images from a NumPy atlas of the tile set images."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence
+
+from PIL import Image as pillow
+import numpy as np
+import numpy.typing as npt
+from tile_sets import ImageTileSet, TileImageStore, default_image_store
+from tile_sets.image_store import ImageKey, get_image_key
+from bitset_wave_functions import BitsetWaveFunction
+
+
+def masks_to_matrix(masks: Sequence[int], num_tiles: int) -> npt.NDArray[np.bool_]:
+    """Expands a sequence of tile bitmasks into a (masks x tiles) boolean matrix."""
+
+    num_bytes = (num_tiles + 7) // 8
+    packed = np.frombuffer(
+        b''.join(mask.to_bytes(num_bytes, 'little') for mask in masks),
+        dtype = np.uint8,
+    ).reshape(len(masks), num_bytes)
+    return np.unpackbits(packed, axis = 1, count = num_tiles, bitorder = 'little').astype(bool)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class RenderCache:
+    """A least-recently-used cache of superposition images, bounded by their total size in bytes.
+
+    Entries are keyed on an atlas identifier and a tile bitmask, so a single cache can be shared by
+    every renderer in the process, including renderers built for separate runs of the same set.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2**20):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.stats = CacheStats()
+        self._images: OrderedDict[tuple[int, int], npt.NDArray[np.uint8]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+
+    def get(self, key: tuple[int, int]) -> npt.NDArray[np.uint8] | None:
+        image = self._images.get(key)
+        if image is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+            self._images.move_to_end(key)
+        return image
+
+
+    def put(self, key: tuple[int, int], image: npt.NDArray[np.uint8]) -> None:
+        if key in self._images or image.nbytes > self.max_bytes:
+            return
+
+        self._images[key] = image
+        self.num_bytes += image.nbytes
+        while self.num_bytes > self.max_bytes:
+            _, evicted_image = self._images.popitem(last = False)
+            self.num_bytes -= evicted_image.nbytes
+            self.stats.evictions += 1
+
+
+    def clear(self) -> None:
+        self._images.clear()
+        self.num_bytes = 0
+
+
+default_render_cache = RenderCache()
+_atlas_ids: dict[tuple[ImageKey, ...], int] = {}
+
+
+class AtlasRenderer:
+    """Renders wave functions by indexing into a single array holding every tile image.
+
+    Superpositions are drawn as the mean of the images of the tiles still possible in the cell,
+    computed as a mask-weighted average over the atlas and held in a shared render cache.
+    """
+
+    def __init__(
+        self,
+        tile_set: ImageTileSet,
+        cache: RenderCache | None = None,
+        image_store: TileImageStore | None = None,
+    ):
+        self.images_size = tile_set.images_size
+        image_specs = [tile.image_spec for tile in tile_set.tiles]
+        self.atlas = (image_store or default_image_store).get_atlas(image_specs)
+
+        # Identify the atlas by its image specs, so recreated tile sets share cache entries
+        image_keys = tuple(get_image_key(image_spec) for image_spec in image_specs)
+        self.atlas_id = _atlas_ids.setdefault(image_keys, len(_atlas_ids))
+        self.cache = cache if cache is not None else default_render_cache
+
+
+    def render_masks(self, masks: Sequence[int]) -> npt.NDArray[np.uint8]:
+        """Renders the superposition of each tile bitmask as a (masks x h x w x 3) array."""
+
+        weights = masks_to_matrix(masks, len(self.atlas)).astype(np.float32)
+        flat_atlas = self.atlas.reshape(len(self.atlas), -1).astype(np.float32)
+        totals = weights.sum(axis = 1, keepdims = True)
+        means = (weights @ flat_atlas) / np.maximum(totals, 1)
+        images: npt.NDArray[np.uint8] = np.rint(means).astype(np.uint8)
+        return images.reshape(len(masks), *self.atlas.shape[1:])
+
+
+    def lookup_masks(self, masks: Sequence[int]) -> npt.NDArray[np.uint8]:
+        """Finds the image of each tile bitmask, rendering and caching any not already known."""
+
+        images = np.empty((len(masks), *self.atlas.shape[1:]), dtype = np.uint8)
+        uncached_positions = []
+        for position, mask in enumerate(masks):
+            if mask.bit_count() == 1:  # Collapsed cells come straight from the atlas
+                images[position] = self.atlas[mask.bit_length() - 1]
+                continue
+            cached_image = self.cache.get((self.atlas_id, mask))
+            if cached_image is None:
+                uncached_positions.append(position)
+            else:
+                images[position] = cached_image
+
+        if uncached_positions:
+            uncached_masks = [masks[position] for position in uncached_positions]
+            rendered_images = self.render_masks(uncached_masks)
+            images[uncached_positions] = rendered_images
+            for mask, rendered_image in zip(uncached_masks, rendered_images):
+                self.cache.put((self.atlas_id, mask), rendered_image.copy())
+
+        return images
+
+
+    def render(self, wave_function: BitsetWaveFunction) -> pillow.Image:
+        """Composes the image of the whole wave function, repeating the edges of cyclic axes."""
+
+        grid = wave_function.grid
+
+        # Render each distinct state once
+        unique_states: dict[int, int] = {}
+        state_indices = np.array([
+            unique_states.setdefault(state, len(unique_states)) for state in wave_function.states
+        ], dtype = np.intp)
+        state_images = self.lookup_masks(list(unique_states))
+
+        # Arrange the cell images, including the wrapped border copies for cyclic axes
+        rows = (np.arange(grid.size_y + 2 * grid.cyclic_y) - grid.cyclic_y) % grid.size_y
+        columns = (np.arange(grid.size_x + 2 * grid.cyclic_x) - grid.cyclic_x) % grid.size_x
+        cell_images = state_images[state_indices[rows[:, None] * grid.size_x + columns[None, :]]]
+
+        height, width = cell_images.shape[:2]
+        image_height, image_width, channels = self.atlas.shape[1:]
+        return pillow.fromarray(
+            cell_images
+            .transpose(0, 2, 1, 3, 4)
+            .reshape(height * image_height, width * image_width, channels),
+        )
+
+
+def _repeat_cyclic_edges(
+    along: npt.NDArray[np.intp],
+    across: npt.NDArray[np.intp],
+    image_indices: npt.NDArray[np.intp],
+    size: int,
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """Adds the border copies of any cells on the edges of a cyclic axis of the canvas."""
+
+    first, last = along == 1, along == size
+    return (
+        np.concatenate([along, np.full(first.sum(), size + 1), np.zeros(last.sum(), np.intp)]),
+        np.concatenate([across, across[first], across[last]]),
+        np.concatenate([image_indices, image_indices[first], image_indices[last]]),
+    )
+
+
+class CanvasRenderer:
+    """Keeps the image of a single wave function up to date, repainting only the changed cells.
+
+    The wave function records which cells have changed since the canvas was last updated, so the
+    cost of each frame scales with the size of the change rather than the size of the grid.
+    """
+
+    def __init__(self, renderer: AtlasRenderer, wave_function: BitsetWaveFunction):
+        self.renderer = renderer
+        self.wave_function = wave_function
+
+        grid = wave_function.grid
+        image_height, image_width, channels = renderer.atlas.shape[1:]
+        rows, columns = grid.size_y + 2 * grid.cyclic_y, grid.size_x + 2 * grid.cyclic_x
+        self.canvas = np.zeros(
+            (rows * image_height, columns * image_width, channels),
+            dtype = np.uint8,
+        )
+        self._cell_view = self.canvas.reshape(rows, image_height, columns, image_width, channels)
+
+
+    def update(self) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+        """Repaints the changed cells, returning the canvas rows and columns which were painted."""
+
+        wave_function, grid = self.wave_function, self.wave_function.grid
+        indices = np.fromiter(wave_function.pop_changed_cells(), dtype = np.intp)
+        images = self.renderer.lookup_masks([wave_function.states[index] for index in indices])
+
+        rows, columns = np.divmod(indices, grid.size_x)
+        rows += grid.cyclic_y
+        columns += grid.cyclic_x
+        image_indices = np.arange(len(indices))
+        if grid.cyclic_x:
+            columns, rows, image_indices = _repeat_cyclic_edges(
+                columns, rows, image_indices, grid.size_x,
+            )
+        if grid.cyclic_y:
+            rows, columns, image_indices = _repeat_cyclic_edges(
+                rows, columns, image_indices, grid.size_y,
+            )
+
+        self._cell_view[rows, :, columns] = images[image_indices]
+        return rows, columns
+
+
+    def render(self) -> pillow.Image:
+        """Brings the canvas up to date and returns a copy of it as an image."""
+
+        self.update()
+        return pillow.fromarray(self.canvas)
@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+
+from tile_sets import Tile
+from bitset_wave_functions import BitsetCell, BitsetWaveFunction
+from wave_functions import Cell
+
+
+@dataclass
+class SolverStats:
+    decisions: int = 0
+    contradictions: int = 0
+    backtracks: int = 0
+
+
+@dataclass
+class Decision:
+    checkpoint: int
+    cell_index: int
+    tile: Tile
+
+
+class BacktrackingSolver:
+    """Collapses a wave function, undoing any decisions which lead to a contradiction.
+
+    Rather than copying the wave function, every state change is recorded on its trail. When a
+    contradiction is reached, the trail is rolled back to before the last decision, that choice of
+    tile is excluded from the cell and the collapse continues. If excluding the tile also leads to
+    a contradiction, the previous decision is undone in turn.
+    """
+
+    def __init__(self, wave_function: BitsetWaveFunction, max_backtracks: int | None = None):
+        """Prepares the solver, with `max_backtracks = None` allowing unlimited backtracking."""
+
+        self.wave_function = wave_function
+        self.max_backtracks = max_backtracks
+        self.stats = SolverStats()
+        self._decisions: list[Decision] = []
+        wave_function.checkpoint()  # Start recording the trail
+
+
+    def run(self) -> SolverStats:
+        """Collapses the wave function completely."""
+
+        while not self.wave_function.collapsed:
+            self.step()
+        return self.stats
+
+
+    def step(self) -> tuple[BitsetCell, Tile]:
+        """Collapses the most constrained cell, backtracking if that results in a contradiction."""
+
+        cell = self.wave_function.get_most_constrained_cell()
+        tile = self.wave_function.choose_tile(cell)
+
+        self.stats.decisions += 1
+        self._decisions.append(Decision(self.wave_function.checkpoint(), cell.index, tile))
+        try:
+            self.wave_function.collapse(cell.index, tile)
+        except Cell.ConstraintError:
+            self._backtrack()
+
+        return cell, tile
+
+
+    def _backtrack(self) -> None:
+        """Undoes decisions until excluding the decided tile leaves a consistent state."""
+
+        while True:
+            self.stats.contradictions += 1
+            if not self._decisions:
+                raise Cell.ConstraintError('The wave function has no consistent collapse')
+            if self.max_backtracks is not None and self.stats.backtracks >= self.max_backtracks:
+                raise Cell.ConstraintError(
+                    f'Backtracking budget of {self.max_backtracks} exceeded',
+                )
+
+            decision = self._decisions.pop()
+            self.wave_function.rollback(decision.checkpoint)
+            self.stats.backtracks += 1
+            try:
+                self.wave_function.exclude(decision.cell_index, decision.tile)
+                return
+            except Cell.ConstraintError:
+                continue
@@ -0,0 +1,68 @@
+from io import BytesIO
+from unittest import TestCase
+
+from PIL import Image as pillow, ImageSequence
+import numpy as np
+from tile_sets import Circles
+from animations import GifWriter, record_collapse
+from bitset_wave_functions import BitsetWaveFunction
+from renderers import AtlasRenderer, CanvasRenderer
+from solvers import BacktrackingSolver
+import grids
+
+
+class Test__Animations(TestCase):
+
+    def setUp(self) -> None:
+        tile_set = Circles()
+        self.renderer = AtlasRenderer(tile_set)
+        self.wave_function = BitsetWaveFunction(
+            grids.Grid2D(6, 5, True, False),
+            tile_set.tiles,
+            seed = 0,
+        )
+        self.canvas = CanvasRenderer(self.renderer, self.wave_function)
+        self.solver = BacktrackingSolver(self.wave_function)
+
+
+    def test__frames_cover_changes(self) -> None:
+        """The first frame covers the whole canvas and later frames only the changed regions."""
+
+        frames = list(record_collapse(self.solver, self.canvas))
+        self.assertTrue(self.wave_function.collapsed)
+        self.assertEqual(frames[0].pixels.shape, self.canvas.canvas.shape)
+        self.assertEqual(frames[-1].decisions, self.solver.stats.decisions)
+
+        canvas = np.zeros_like(self.canvas.canvas)
+        for frame in frames:
+            left, top = frame.offset
+            height, width = frame.pixels.shape[:2]
+            self.assertLessEqual(frame.pixels.size, canvas.size)
+            canvas[top:top + height, left:left + width] = frame.pixels
+        np.testing.assert_array_equal(
+            canvas,
+            np.asarray(self.renderer.render(self.wave_function)),
+        )
+
+
+    def test__gif_shows_final_collapse(self) -> None:
+        """The last frame of the written GIF shows the collapsed wave function."""
+
+        file = BytesIO()
+        with GifWriter(file, self.canvas) as writer:
+            for frame in record_collapse(self.solver, self.canvas, every = 3):
+                writer.write(frame)
+
+        file.seek(0)
+        with pillow.open(file) as animation:
+            self.assertEqual(animation.n_frames, writer.frames)
+            *_, last_frame = ImageSequence.Iterator(animation)
+            expected_image = (
+                self.renderer.render(self.wave_function)
+                .quantize(palette = writer.palette, dither = pillow.Dither.NONE)
+                .convert('RGB')
+            )
+            np.testing.assert_array_equal(
+                np.asarray(last_frame.convert('RGB')),
+                np.asarray(expected_image),
+            )
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import numpy as np
+from tile_sets import Circuits, GreenKnots
+from chunks import ChunkedWorld
+import grids
+
+
+class Test__ChunkedWorld(TestCase):
+
+    def setUp(self) -> None:
+        self.tiles = GreenKnots().tiles
+        self.world = ChunkedWorld(self.tiles, chunk_size = 10, seed = 3, max_chunks = 2)
+
+    def _assert_seams_consistent(self, world: ChunkedWorld) -> None:
+        """Checks that every tile in the chunks around the origin matches its neighbours."""
+
+        size = 2 * world.chunk_size
+        region = np.array([
+            [world.tiles.index(world.tile_at(x, y)) for x in range(-size, size)]
+            for y in range(-size, size)
+        ])
+
+        allowed_right, allowed_down = (
+            world.compatibility.allowed_neighbours[direction]
+            for direction in [grids.Direction.RIGHT, grids.Direction.DOWN]
+        )
+        for (row, column), tile_index in np.ndenumerate(region[:-1, :-1]):
+            self.assertTrue(allowed_right[tile_index] >> region[row, column + 1] & 1)
+            self.assertTrue(allowed_down[tile_index] >> region[row + 1, column] & 1)
+
+
+    def test__seams_are_consistent(self) -> None:
+        """Tiles either side of chunk boundaries are compatible with each other."""
+
+        self._assert_seams_consistent(self.world)
+
+
+    def test__circuit_chunks_are_completed(self) -> None:
+        """Seams crossed by tracks, cables and chips still leave chunk interiors completable."""
+
+        for tile_set in [Circuits(), Circuits(Circuits.best_tile_subset)]:
+            for seed in range(3):
+                world = ChunkedWorld(
+                    tile_set.tiles,
+                    chunk_size = 10,
+                    seed = seed,
+                    compatibility = tile_set.compatibility,
+                    max_attempts = 1,
+                )
+                self._assert_seams_consistent(world)
+
+
+    def test__chunks_are_regenerated_identically(self) -> None:
+        """Evicted chunks are regenerated as before, regardless of the order of generation."""
+
+        first_chunk = self.world.get_chunk(0, 0).tile_indices
+        for chunk_x in range(1, 4):
+            self.world.get_chunk(chunk_x, 1)
+        self.assertEqual(len(self.world), 2)
+        np.testing.assert_array_equal(self.world.get_chunk(0, 0).tile_indices, first_chunk)
+
+        other_world = ChunkedWorld(self.tiles, chunk_size = 10, seed = 3)
+        other_world.get_chunk(-1, 0)
+        np.testing.assert_array_equal(other_world.get_chunk(0, 0).tile_indices, first_chunk)
+        self.assertEqual(self.world.chunks_generated, 5)
+
+
+    def test__seams_are_collapsed_once(self) -> None:
+        """Neighbouring chunks share the corners and seams between them, collapsing each once."""
+
+        world = ChunkedWorld(self.tiles, chunk_size = 10, seed = 3)
+        for chunk_x in range(2):
+            for chunk_y in range(2):
+                world.get_chunk(chunk_x, chunk_y)
+        self.assertEqual(world.corners_generated, 3 * 3)
+        self.assertEqual(world.seams_generated, 2 * 2 * 3)
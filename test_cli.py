@@ -0,0 +1,28 @@
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+
+from tile_sets import sequential_dominoes
+from bitset_wave_functions import BitsetWaveFunction
+from wave_functions import WaveFunction
+from tiles_cli_1d import CliRunner1D
+import grids
+
+
+class Test__CliRunner(TestCase):
+
+    def test__runs_any_engine(self) -> None:
+        """Both engines are collapsed, with backtracking only reported by the bitset engine."""
+
+        grid = grids.Grid1D(6, True)
+        _, tile_set = sequential_dominoes(4, True, False)
+        for wave_function_class in [WaveFunction, BitsetWaveFunction]:
+            wave_function = wave_function_class(grid, tile_set, seed = 0)
+            output = StringIO()
+            with redirect_stdout(output):
+                CliRunner1D(wave_function, False).run()
+
+            self.assertTrue(wave_function.collapsed)
+            self.assertEqual(
+                'backtracks' in output.getvalue(), wave_function_class is BitsetWaveFunction,
+            )
@@ -0,0 +1,76 @@
+from unittest import TestCase
+
+import numpy as np
+import grids
+
+
+class Test__Grid2D(TestCase):
+
+    def test__neighbour_tables(self) -> None:
+        """Neighbour tables hold the index of each neighbour, wrapping only on cyclic axes."""
+
+        neighbour_tables = grids.Grid2D(3, 2, True, False).get_neighbour_tables()
+        np.testing.assert_array_equal(neighbour_tables[grids.Direction.LEFT], [2, 0, 1, 5, 3, 4])
+        np.testing.assert_array_equal(neighbour_tables[grids.Direction.RIGHT], [1, 2, 0, 4, 5, 3])
+        np.testing.assert_array_equal(neighbour_tables[grids.Direction.UP], [-1, -1, -1, 0, 1, 2])
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.DOWN], [3, 4, 5, -1, -1, -1],
+        )
+
+
+    def test__neighbour_tables_are_shared(self) -> None:
+        """The tables are built once per grid and cannot be modified by their users."""
+
+        grid = grids.Grid2D(4, 4, False, False)
+        neighbour_tables = grid.get_neighbour_tables()
+        self.assertIs(grid.get_neighbour_tables(), neighbour_tables)
+        with self.assertRaises(TypeError):
+            neighbour_tables[grids.Direction.LEFT][0] = 1
+
+
+class Test__Grid1D(TestCase):
+
+    def test__neighbour_tables(self) -> None:
+        """One dimensional grids only have horizontal neighbours."""
+
+        neighbour_tables = grids.Grid1D(3, False).get_neighbour_tables()
+        self.assertEqual(set(neighbour_tables), {grids.Direction.LEFT, grids.Direction.RIGHT})
+        np.testing.assert_array_equal(neighbour_tables[grids.Direction.LEFT], [-1, 0, 1])
+        np.testing.assert_array_equal(neighbour_tables[grids.Direction.RIGHT], [1, 2, -1])
+
+
+class Test__GridHex(TestCase):
+
+    def test__neighbour_tables(self) -> None:
+        """Hexagonal cells have six neighbours, with the diagonals skewed along the rows."""
+
+        grid = grids.GridHex(3, 2, True, False)
+        neighbour_tables = grid.get_neighbour_tables()
+        self.assertEqual(set(neighbour_tables), set(grid.directions))
+        self.assertEqual(len(grid.directions), 6)
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.UP_RIGHT], [-1, -1, -1, 1, 2, 0],
+        )
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.DOWN_LEFT], [5, 3, 4, -1, -1, -1],
+        )
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.UP_LEFT], [-1, -1, -1, 0, 1, 2],
+        )
+
+
+class Test__Grid3D(TestCase):
+
+    def test__neighbour_tables(self) -> None:
+        """Cubic cells have six neighbours, with layers stacked along the forward axis."""
+
+        grid = grids.Grid3D(2, 2, 3, False, False, True)
+        neighbour_tables = grid.get_neighbour_tables()
+        self.assertEqual(set(neighbour_tables), set(grid.directions))
+        self.assertEqual(grid.shape, (3, 2, 2))
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.FORWARD], [4, 5, 6, 7, 8, 9, 10, 11, 0, 1, 2, 3],
+        )
+        np.testing.assert_array_equal(
+            neighbour_tables[grids.Direction.DOWN], [2, 3, -1, -1, 6, 7, -1, -1, 10, 11, -1, -1],
+        )
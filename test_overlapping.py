@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+from PIL import Image as pillow
+import numpy as np
+from overlapping import OverlappingModel, compile_overlaps, extract_patterns, index_colours
+import solvers
+import grids
+
+
+class Test__ExtractPatterns(TestCase):
+
+    def setUp(self) -> None:
+        self.colour_indices = np.random.default_rng(0).integers(3, size = (7, 5))
+
+
+    def test__matches_individual_windows(self) -> None:
+        """Every window of the wrapped image is found, in each rotation and reflection."""
+
+        patterns, counts = extract_patterns(self.colour_indices, 3, True, True)
+        self.assertEqual(counts.sum(), 8 * self.colour_indices.size)
+
+        expected = set()
+        wrapped = np.pad(self.colour_indices, ((0, 2), (0, 2)), mode = 'wrap')
+        for row in range(7):
+            for column in range(5):
+                window = wrapped[row:row + 3, column:column + 3]
+                for turns in range(4):
+                    expected.add(np.rot90(window, turns).tobytes())
+                    expected.add(np.fliplr(np.rot90(window, turns)).tobytes())
+        self.assertEqual({pattern.tobytes() for pattern in patterns}, expected)
+
+
+    def test__bounded_samples_are_not_wrapped(self) -> None:
+        """Without wrapping, only the windows wholly inside the image are found."""
+
+        patterns, counts = extract_patterns(self.colour_indices, 3, periodic = False)
+        self.assertEqual(counts.sum(), 5 * 3)
+        np.testing.assert_array_equal(
+            patterns[np.argmax([
+                pattern.tobytes() == self.colour_indices[:3, :3].tobytes()
+                for pattern in patterns
+            ])],
+            self.colour_indices[:3, :3],
+        )
+
+
+class Test__CompileOverlaps(TestCase):
+
+    def test__neighbours_agree_on_overlap(self) -> None:
+        """A pattern is allowed beside another exactly when the two agree where they overlap."""
+
+        colour_indices = np.random.default_rng(1).integers(2, size = (6, 6))
+        patterns, _ = extract_patterns(colour_indices, 2)
+        compatibility = compile_overlaps(patterns)
+
+        for pattern_index, pattern in enumerate(patterns):
+            for neighbour_index, neighbour in enumerate(patterns):
+                allowed = compatibility.allowed_neighbours
+                self.assertEqual(
+                    bool(allowed[grids.Direction.RIGHT][pattern_index] & 1 << neighbour_index),
+                    np.array_equal(pattern[:, 1:], neighbour[:, :-1]),
+                )
+                self.assertEqual(
+                    bool(allowed[grids.Direction.UP][pattern_index] & 1 << neighbour_index),
+                    np.array_equal(pattern[:-1], neighbour[1:]),
+                )
+
+
+class Test__OverlappingModel(TestCase):
+
+    def setUp(self) -> None:
+        pixels = np.zeros((8, 8, 3), dtype = np.uint8)
+        pixels[::4] = (200, 0, 0)
+        pixels[:, 1::3] = (0, 0, 200)
+        self.sample = pillow.fromarray(pixels)
+        self.model = OverlappingModel(self.sample, 3, rotations = True)
+
+
+    def test__collapse_is_consistent(self) -> None:
+        """Collapsed neighbours hold patterns which agree wherever they overlap."""
+
+        grid = grids.Grid2D(12, 10, True, False)
+        wave_function = self.model.create_wave_function(grid, seed = 0)
+        solvers.BacktrackingSolver(wave_function).run()
+
+        patterns = self.model.patterns[wave_function.get_tile_indices()]
+        np.testing.assert_array_equal(patterns[:-1, :, 1:], patterns[1:, :, :-1])
+        np.testing.assert_array_equal(
+            patterns[..., 1:], np.roll(patterns, -1, axis = 1)[..., :-1],
+        )
+
+
+    def test__renders_sample_colours(self) -> None:
+        """Collapsed grids are drawn in the colours of the sample, with bounded axes extended."""
+
+        grid = grids.Grid2D(12, 10, True, False)
+        wave_function = self.model.create_wave_function(grid, seed = 1)
+        solvers.BacktrackingSolver(wave_function).run()
+
+        image = self.model.render(wave_function)
+        self.assertEqual(image.size, (12, 12))
+        colours, _ = index_colours(image)
+        sample_colours, _ = index_colours(self.sample)
+        self.assertTrue({colour.tobytes() for colour in colours} <= {
+            colour.tobytes() for colour in sample_colours
+        })
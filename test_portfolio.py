@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from tile_sets import GreenKnots
+import portfolio
+
+
+class Test__Portfolio(TestCase):
+
+    def setUp(self) -> None:
+        # Corners and lines on a torus regularly trap a greedy collapse, with no backtracking
+        self.spec = portfolio.PortfolioSpec(
+            GreenKnots,
+            [GreenKnots.TileTypes.CORNER, GreenKnots.TileTypes.LINE],
+            (5, 3),
+            cyclic = True,
+            max_backtracks = 0,
+        )
+
+
+    def test__first_success_is_replayed(self) -> None:
+        """Every worker reports back, and the winning collapse is replayed consistently."""
+
+        for seed in range(0, 6, 2):
+            result = portfolio.solve(self.spec, num_workers = 2, seed = seed)
+            self.assertEqual([report.worker for report in result.reports], [0, 1])
+            self.assertEqual([report.seed for report in result.reports], [seed, seed + 1])
+            assert result.wave_function is not None and result.winner is not None
+
+            winning_report = result.reports[result.winner]
+            wave_function = result.wave_function
+            self.assertTrue(winning_report.succeeded)
+            self.assertTrue(wave_function.collapsed)
+            self.assertEqual(
+                [state.bit_length() - 1 for state in wave_function.states],
+                winning_report.tile_indices,
+            )
+
+            allowed_neighbours = wave_function.compatibility.allowed_neighbours
+            states = wave_function.states
+            for index, state in enumerate(states):
+                for direction, neighbour_index in wave_function.get_neighbours(index).items():
+                    allowed_mask = allowed_neighbours[direction][state.bit_length() - 1]
+                    self.assertTrue(allowed_mask & states[neighbour_index])
+
+
+    def test__failed_workers_are_reported(self) -> None:
+        """Without any success, no wave function is returned, but every worker still reports."""
+
+        # Corners can never close on a torus with an odd number of cells along each axis
+        spec = portfolio.PortfolioSpec(
+            GreenKnots,
+            [GreenKnots.TileTypes.CORNER],
+            (3, 3),
+            cyclic = True,
+            max_backtracks = 0,
+            max_attempts = 2,
+        )
+        result = portfolio.solve(spec, num_workers = 2)
+        self.assertIsNone(result.wave_function)
+        self.assertIsNone(result.winner)
+        self.assertEqual([report.attempts for report in result.reports], [2, 2])
+        self.assertEqual([report.contradictions for report in result.reports], [2, 2])
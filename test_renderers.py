@@ -0,0 +1,128 @@
+from unittest import TestCase
+
+import numpy as np
+from tile_sets import GreenKnots
+from bitset_wave_functions import BitsetWaveFunction
+from renderers import AtlasRenderer, CanvasRenderer, RenderCache
+import grids
+
+
+class Test__AtlasRenderer(TestCase):
+
+    def setUp(self) -> None:
+        self.tile_set = GreenKnots()
+        self.renderer = AtlasRenderer(self.tile_set)
+
+
+    def test__collapsed_cells_use_tile_images(self) -> None:
+        """A collapsed cell is drawn as exactly the image of its tile."""
+
+        grid = grids.Grid2D(3, 2, False, False)
+        wave_function = BitsetWaveFunction(grid, self.tile_set.tiles, seed = 0)
+        cell = wave_function.cells[4]
+        cell.tile = tile = wave_function.choose_tile(cell)
+
+        width, height = self.tile_set.images_size
+        image = self.renderer.render(wave_function)
+        self.assertEqual(image.size, (3 * width, 2 * height))
+        np.testing.assert_array_equal(
+            np.asarray(image.crop((width, height, 2 * width, 2 * height))),
+            np.asarray(self.tile_set.tiles[wave_function.tile_indices[id(tile)]].image),
+        )
+
+
+    def test__superpositions_are_averaged(self) -> None:
+        """Uncollapsed cells are drawn as the mean of their remaining tile images."""
+
+        mean_image = self.renderer.render_masks([0b101])[0]
+        expected = (self.renderer.atlas[0].astype(float) + self.renderer.atlas[2]) / 2
+        self.assertLessEqual(np.abs(mean_image - expected).max(), 0.5)
+
+
+    def test__cyclic_edges_are_repeated(self) -> None:
+        """Cyclic axes gain a border of the cells wrapped around from the opposite edge."""
+
+        grid = grids.Grid2D(3, 2, True, False)
+        wave_function = BitsetWaveFunction(grid, self.tile_set.tiles, seed = 0)
+        cell = wave_function.cells[0]
+        cell.tile = wave_function.choose_tile(cell)
+
+        width, height = self.tile_set.images_size
+        image = np.asarray(self.renderer.render(wave_function))
+        self.assertEqual(image.shape, (2 * height, 5 * width, 3))
+        np.testing.assert_array_equal(image[:height, width:2 * width], image[:height, 4 * width:])
+
+
+class Test__CanvasRenderer(TestCase):
+
+    def setUp(self) -> None:
+        tile_set = GreenKnots()
+        self.renderer = AtlasRenderer(tile_set)
+        self.wave_function = BitsetWaveFunction(
+            grids.Grid2D(5, 4, True, True),
+            tile_set.tiles,
+            seed = 0,
+        )
+        self.canvas = CanvasRenderer(self.renderer, self.wave_function)
+
+
+    def test__matches_full_render(self) -> None:
+        """Repainting only the changed cells leaves the same image as rendering every cell."""
+
+        self.canvas.render()
+        for cell_index in [0, 4, 12, 19, 7]:
+            cell = self.wave_function.cells[cell_index]
+            if not cell.collapsed:
+                cell.tile = self.wave_function.choose_tile(cell)
+            np.testing.assert_array_equal(
+                np.asarray(self.canvas.render()),
+                np.asarray(self.renderer.render(self.wave_function)),
+            )
+
+
+    def test__only_changed_cells_are_painted(self) -> None:
+        """Once up to date, only cells changed since the last update are repainted."""
+
+        rows, columns = self.canvas.update()
+        self.assertEqual(len(rows), 7 * 6)
+        rows, columns = self.canvas.update()
+        self.assertEqual(len(rows), 0)
+
+        states = list(self.wave_function.states)
+        self.wave_function.collapse(6, self.wave_function.tiles[0])
+        rows, columns = self.canvas.update()
+        painted_cells = {
+            (row - 1) * 5 + column - 1 for row, column in zip(rows, columns)
+            if 1 <= row <= 4 and 1 <= column <= 5
+        }
+        self.assertEqual(painted_cells, {
+            index for index, state in enumerate(self.wave_function.states)
+            if state != states[index]
+        })
+
+
+class Test__RenderCache(TestCase):
+
+    def test__shared_between_renderers(self) -> None:
+        """Renderers for recreated tile sets reuse each other's cached superpositions."""
+
+        cache = RenderCache()
+        AtlasRenderer(GreenKnots(), cache).lookup_masks([0b11, 0b101])
+        AtlasRenderer(GreenKnots(), cache).lookup_masks([0b11, 0b110])
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 3))
+
+
+    def test__evicts_least_recently_used(self) -> None:
+        """Once full, the least recently used images are evicted first."""
+
+        image = np.zeros((10, 10, 3), dtype = np.uint8)
+        cache = RenderCache(max_bytes = 2 * image.nbytes)
+        cache.put((0, 1), image)
+        cache.put((0, 2), image)
+        cache.get((0, 1))
+        cache.put((0, 3), image)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats.evictions, 1)
+        self.assertIsNone(cache.get((0, 2)))
+        self.assertIsNotNone(cache.get((0, 1)))
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from tile_sets import GreenKnots
+from bitset_wave_functions import BitsetWaveFunction, SupportCountingWaveFunction
+from solvers import BacktrackingSolver
+from wave_functions import Cell
+import grids
+
+
+class Test__BacktrackingSolver(TestCase):
+
+    def setUp(self) -> None:
+        # Corners and lines on a torus regularly trap a greedy collapse
+        self.tile_set = GreenKnots([GreenKnots.TileTypes.CORNER, GreenKnots.TileTypes.LINE])
+        self.grid = grids.Grid2D(6, 6, True, True)
+
+
+    def test__rollback_restores_state(self) -> None:
+        """Rolling back to a checkpoint restores both the states and the support counts."""
+
+        wave_function = SupportCountingWaveFunction(self.grid, self.tile_set.tiles, seed = 0)
+        states, supports = wave_function.states[:], wave_function.supports[:]
+
+        checkpoint = wave_function.checkpoint()
+        cell = wave_function.get_most_constrained_cell()
+        cell.tile = wave_function.choose_tile(cell)
+        self.assertNotEqual(wave_function.states, states)
+
+        wave_function.rollback(checkpoint)
+        self.assertEqual(wave_function.states, states)
+        self.assertEqual(wave_function.supports, supports)
+        self.assertFalse(wave_function.collapsed)
+
+
+    def test__recovers_from_contradictions(self) -> None:
+        """The solver completes collapses which would otherwise fail."""
+
+        contradictions = 0
+        for seed in range(10):
+            wave_function = BitsetWaveFunction(self.grid, self.tile_set.tiles, seed = seed)
+            stats = BacktrackingSolver(wave_function).run()
+
+            self.assertTrue(wave_function.collapsed)
+            contradictions += stats.contradictions
+        self.assertGreater(contradictions, 0)
+
+
+    def test__backtracking_budget(self) -> None:
+        """Exceeding the backtracking budget raises the usual constraint error."""
+
+        seed = next(
+            seed for seed in range(100)
+            if BacktrackingSolver(
+                BitsetWaveFunction(self.grid, self.tile_set.tiles, seed = seed),
+            ).run().backtracks
+        )
+        wave_function = BitsetWaveFunction(self.grid, self.tile_set.tiles, seed = seed)
+        with self.assertRaises(Cell.ConstraintError):
+            BacktrackingSolver(wave_function, max_backtracks = 0).run()
@@ -0,0 +1,334 @@
+from array import array
+from dataclasses import replace
+from io import BytesIO
+from unittest import TestCase
+
+import numpy as np
+from tile_sets import Tile, ascii_box_tiles, hex_pipe_tiles, voxel_pipe_tiles
+from bitset_wave_functions import BitsetWaveFunction, SupportCountingWaveFunction
+from wave_functions import Cell, WaveFunction, WaveFunctionLike, get_entropy
+import grids
+
+
+def _tiles_match(tile: Tile, neighbour: Tile, direction: grids.Direction) -> bool:
+    connector = tile.connectors[direction]
+    return connector in neighbour.connectors[grids.flip_direction(direction)].connects_to
+
+
+def _collapse(wave_function: WaveFunctionLike) -> None:
+    while not wave_function.collapsed:
+        cell = wave_function.get_most_constrained_cell()
+        cell.tile = wave_function.choose_tile(cell)
+
+
+class Test__BitsetWaveFunction(TestCase):
+
+    def setUp(self) -> None:
+        self.connectors, self.tiles = ascii_box_tiles()
+        self.grid = grids.Grid2D(8, 6, False, False)
+
+    def _apply_boundaries(self, wave_function: WaveFunctionLike) -> None:
+        for direction in self.grid.directions:
+            wave_function.apply_boundary_constraint(direction, {self.connectors[0]})
+
+    def _assert_consistent(self, wave_function: BitsetWaveFunction) -> None:
+        for index, cell in enumerate(wave_function.cells):
+            for direction, neighbour_index in wave_function.get_neighbours(index).items():
+                tile, neighbour_tile = cell.tile, wave_function.cells[neighbour_index].tile
+                assert tile and neighbour_tile
+                self.assertTrue(_tiles_match(tile, neighbour_tile, direction))
+
+
+    def test__boundary_constraints_match_reference(self) -> None:
+        """The bitset engine reaches the same state as the reference engine."""
+
+        reference = WaveFunction(self.grid, self.tiles)
+        bitset = BitsetWaveFunction(self.grid, self.tiles)
+        self._apply_boundaries(reference)
+        self._apply_boundaries(bitset)
+
+        for reference_cell, bitset_cell in zip(reference.cells, bitset.cells):
+            self.assertEqual(
+                [tile.id for tile in reference_cell.state],
+                [tile.id for tile in bitset_cell.state],
+            )
+
+
+    def test__collapse_is_consistent(self) -> None:
+        """A fully collapsed wave function only contains compatible neighbours."""
+
+        wave_function = BitsetWaveFunction(self.grid, self.tiles, seed = 1)
+        self._apply_boundaries(wave_function)
+        _collapse(wave_function)
+        self._assert_consistent(wave_function)
+
+
+    def test__hexagonal_collapse_is_consistent(self) -> None:
+        """Collapses over hexagonal grids match tiles across all six edges."""
+
+        connectors, tiles = hex_pipe_tiles()
+        grid = grids.GridHex(7, 5, False, True)
+        wave_function = SupportCountingWaveFunction(grid, tiles, seed = 1)
+        for direction in grid.directions:
+            wave_function.apply_boundary_constraint(direction, {connectors[0]})
+        _collapse(wave_function)
+        self._assert_consistent(wave_function)
+
+        for index in range(grid.size_total):
+            on_edge = index % grid.size_x in [0, grid.size_x - 1]
+            self.assertEqual(len(wave_function.get_neighbours(index)), 4 if on_edge else 6)
+
+
+    def test__cubic_collapse_is_consistent(self) -> None:
+        """Collapses over cubic grids match tiles across all six faces."""
+
+        connectors, tiles = voxel_pipe_tiles()
+        grid = grids.Grid3D(5, 4, 3, False, True, False)
+        wave_function = SupportCountingWaveFunction(grid, tiles, seed = 3)
+        for direction in grid.directions:
+            wave_function.apply_boundary_constraint(direction, {connectors[0]})
+        _collapse(wave_function)
+        self._assert_consistent(wave_function)
+
+
+    def test__tile_indices_round_trip(self) -> None:
+        """Tile indices are arranged in the shape of the grid and survive saving to `.npy`."""
+
+        connectors, tiles = voxel_pipe_tiles()
+        grid = grids.Grid3D(4, 3, 2, False, False, False)
+        wave_function = BitsetWaveFunction(grid, tiles, seed = 0)
+        wave_function.collapse(5, tiles[7])
+        tile_indices = wave_function.get_tile_indices()
+        self.assertEqual(tile_indices.shape, (2, 3, 4))
+        self.assertEqual(tile_indices.dtype, np.int8)
+        self.assertEqual(tile_indices[0, 1, 1], 7)
+
+        _collapse(wave_function)
+        file = BytesIO()
+        np.save(file, wave_function.get_tile_indices())
+        file.seek(0)
+        np.testing.assert_array_equal(
+            np.load(file).ravel(),
+            [state.bit_length() - 1 for state in wave_function.states],
+        )
+
+
+    def test__states_are_compact(self) -> None:
+        """States and supports are held in flat arrays, unless the tiles are too many for words."""
+
+        wave_function = SupportCountingWaveFunction(self.grid, self.tiles)
+        states, supports = wave_function.states, wave_function.supports
+        assert isinstance(states, array)
+        self.assertEqual((states.typecode, supports.typecode), ('Q', 'H'))
+        self.assertEqual(len(supports), self.grid.size_total * 4 * len(self.tiles))
+
+        many_tiles = [replace(tile, id = tile.id + copy) for copy in 'AB' for tile in self.tiles]
+        wave_function = SupportCountingWaveFunction(self.grid, many_tiles, seed = 0)
+        self.assertIsInstance(wave_function.states, list)
+        self._apply_boundaries(wave_function)
+        _collapse(wave_function)
+
+
+    def test__support_counting_matches_bitset(self) -> None:
+        """Support counting propagation produces identical collapses to mask propagation."""
+
+        outputs = []
+        for wave_function_class in [BitsetWaveFunction, SupportCountingWaveFunction]:
+            wave_function = wave_function_class(self.grid, self.tiles, seed = 2)
+            self._apply_boundaries(wave_function)
+            _collapse(wave_function)
+            outputs.append(wave_function.states)
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+    def test__most_constrained_cell_has_smallest_state(self) -> None:
+        """Cell selection always picks from the smallest remaining uncollapsed states."""
+
+        wave_function = BitsetWaveFunction(self.grid, self.tiles, seed = 3)
+        self._apply_boundaries(wave_function)
+        while not wave_function.collapsed:
+            smallest_size = min(
+                len(cell.state) for cell in wave_function.cells if not cell.collapsed
+            )
+            cell = wave_function.get_most_constrained_cell()
+            self.assertEqual(len(cell.state), smallest_size)
+            cell.tile = wave_function.choose_tile(cell)
+
+
+    def test__entropy_sums_follow_removals(self) -> None:
+        """Entropies from running weight sums match those of the states, even after rollback."""
+
+        tiles = [replace(tile, weight = 1. + index) for index, tile in enumerate(self.tiles)]
+        wave_function = SupportCountingWaveFunction(self.grid, tiles, seed = 6)
+        self._apply_boundaries(wave_function)
+
+        def assert_entropies_match() -> None:
+            for index, cell in enumerate(wave_function.cells):
+                if not cell.collapsed:
+                    self.assertAlmostEqual(
+                        wave_function.get_entropy(index), get_entropy(cell.state),
+                    )
+
+        checkpoint = wave_function.checkpoint()
+        for _ in range(5):
+            cell = wave_function.get_most_constrained_cell()
+            cell.tile = wave_function.choose_tile(cell)
+        assert_entropies_match()
+        wave_function.rollback(checkpoint)
+        assert_entropies_match()
+
+
+    def test__uniform_weights_keep_no_sums(self) -> None:
+        """Without weights no running sums are kept, and entropies follow from the tile counts."""
+
+        wave_function = SupportCountingWaveFunction(self.grid, self.tiles, seed = 6)
+        self._apply_boundaries(wave_function)
+        for _ in range(5):
+            cell = wave_function.get_most_constrained_cell()
+            cell.tile = wave_function.choose_tile(cell)
+
+        for candidate in [wave_function, wave_function.clone()]:
+            self.assertFalse(candidate._weight_sums or candidate._log_weight_sums)
+            for index, cell in enumerate(candidate.cells):
+                if not cell.collapsed:
+                    self.assertAlmostEqual(candidate.get_entropy(index), get_entropy(cell.state))
+
+
+    def test__weighted_cell_has_lowest_entropy(self) -> None:
+        """With weighted tiles, cell selection always picks from the lowest remaining entropies."""
+
+        tiles = [replace(tile, weight = 1. + index % 3) for index, tile in enumerate(self.tiles)]
+        wave_function = BitsetWaveFunction(self.grid, tiles, seed = 7)
+        self._apply_boundaries(wave_function)
+        while not wave_function.collapsed:
+            lowest_entropy = min(
+                get_entropy(cell.state) for cell in wave_function.cells if not cell.collapsed
+            )
+            cell = wave_function.get_most_constrained_cell()
+            self.assertAlmostEqual(get_entropy(cell.state), lowest_entropy, places = 5)
+            cell.tile = wave_function.choose_tile(cell)
+
+
+    def test__weights_bias_tile_selection(self) -> None:
+        """Tiles are chosen in proportion to their weights."""
+
+        tiles = [replace(self.tiles[0], weight = 9.), self.tiles[1]]
+        for wave_function_class in [WaveFunction, BitsetWaveFunction]:
+            wave_function = wave_function_class(grids.Grid1D(1, False), tiles, seed = 8)
+            cell = wave_function.cells[0]
+            choices = [wave_function.choose_tile(cell) for _ in range(1000)]
+            self.assertAlmostEqual(choices.count(tiles[0]) / len(choices), 0.9, delta = 0.05)
+
+
+    def test__seeded_collapse_is_reproducible(self) -> None:
+        """A given tile set, grid and seed always produce the same output."""
+
+        outputs = []
+        for _ in range(2):
+            wave_function = BitsetWaveFunction(self.grid, self.tiles, seed = 4)
+            self._apply_boundaries(wave_function)
+            _collapse(wave_function)
+            outputs.append(wave_function.states)
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+    def test__bulk_constraints_match_individual(self) -> None:
+        """Applying constraints and fixed tiles in bulk matches applying them one at a time."""
+
+        solved = BitsetWaveFunction(self.grid, self.tiles, seed = 5)
+        self._apply_boundaries(solved)
+        _collapse(solved)
+        fixed_tiles = {index: solved.tiles_from_mask(solved.states[index])[0] for index in [9, 20]}
+
+        individual = BitsetWaveFunction(self.grid, self.tiles)
+        self._apply_boundaries(individual)
+        for index, tile in fixed_tiles.items():
+            individual.cells[index].tile = tile
+
+        bulk = BitsetWaveFunction(self.grid, self.tiles)
+        bulk.apply_constraints(
+            [
+                (index, direction, {self.connectors[0]})
+                for direction in self.grid.directions
+                for index in grids.get_boundary_indices(self.grid, grids.flip_direction(direction))
+            ],
+            fixed_tiles,
+        )
+        self.assertEqual(bulk.states, individual.states)
+
+
+    def test__clones_match_new_wave_functions(self) -> None:
+        """A clone of a constrained template collapses exactly like a newly built wave function."""
+
+        for wave_function_class in [BitsetWaveFunction, SupportCountingWaveFunction]:
+            template = wave_function_class(self.grid, self.tiles)
+            self._apply_boundaries(template)
+            template_states = template.states[:]
+
+            rebuilt = wave_function_class(self.grid, self.tiles, seed = 6)
+            self._apply_boundaries(rebuilt)
+            outputs = []
+            for wave_function in [template.clone(seed = 6), rebuilt]:
+                _collapse(wave_function)
+                outputs.append(wave_function.states)
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(template.states, template_states)
+
+
+class Test__PropagationStats(TestCase):
+
+    def setUp(self) -> None:
+        self.connectors, self.tiles = ascii_box_tiles()
+        c0, c1, c2 = self.connectors[:3]
+        self.constraints = [(grids.Direction.RIGHT, {c0, c1}), (grids.Direction.RIGHT, {c1, c2})]
+
+
+    def test__reference_constraints_are_coalesced(self) -> None:
+        """Constraints queued for the same cell and direction are intersected into one entry."""
+
+        cell = Cell('1', self.tiles)
+        stats = WaveFunction.propagate_constraints([
+            {'cell': cell, 'direction': direction, 'constraint': constraint}
+            for direction, constraint in self.constraints
+        ])
+        self.assertEqual((stats.enqueued, stats.coalesced, stats.processed), (1, 1, 1))
+
+        expected_cell = Cell('1', self.tiles)
+        expected_cell.constrain(grids.Direction.RIGHT, {self.connectors[1]})
+        self.assertEqual(cell.state, expected_cell.state)
+
+
+    def test__bitset_constraints_are_coalesced(self) -> None:
+        """Constraints reducing a cell which is already queued do not queue it again."""
+
+        wave_function = BitsetWaveFunction(grids.Grid1D(1, False), self.tiles)
+        wave_function.apply_constraints([
+            (0, direction, constraint) for direction, constraint in self.constraints
+        ])
+        stats = wave_function.propagation_stats
+        self.assertEqual((stats.enqueued, stats.coalesced, stats.processed), (1, 1, 1))
+        self.assertEqual(
+            wave_function.cells[0].mask,
+            wave_function.mask_from_constraint(grids.Direction.RIGHT, {self.connectors[1]}),
+        )
+
+
+    def test__collapses_are_counted(self) -> None:
+        """Both engines count the waves started by collapsing cells, processing every entry."""
+
+        grid = grids.Grid2D(5, 4, False, False)
+        wave_functions: list[WaveFunction | BitsetWaveFunction] = [
+            WaveFunction(grid, self.tiles), BitsetWaveFunction(grid, self.tiles),
+        ]
+        for wave_function in wave_functions:
+            wave_function.apply_boundary_constraint(grids.Direction.RIGHT, {self.connectors[0]})
+            boundary_stats = replace(wave_function.propagation_stats)
+            wave_function.cells[7].tile = self.tiles[0]
+
+            stats = wave_function.propagation_stats
+            self.assertGreater(stats.enqueued, boundary_stats.enqueued)
+            self.assertGreater(stats.processed, boundary_stats.processed)
+            self.assertEqual(stats.processed, stats.enqueued)
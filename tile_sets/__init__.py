@@ -1,22 +1,77 @@
+"""Tiles, connectors and the tile sets built from them.
+
+The tile sets (and with them Pillow) are only imported when first accessed, so that programs using
+only the core types do not pay for loading the image tile sets.
+"""
+from typing import TYPE_CHECKING
+import importlib
+
 from .tile_types import Tile, Connector, create_paired_connectors
-from .sequential_dominoes import create as sequential_dominoes
-from .ascii_boxes import create as ascii_box_tiles
-from .ascii_blocks import create as ascii_block_tiles
-from .image_tiles import ImageTile, ImageTileSet
-from .green_knots import GreenKnots
-from .circles import Circles
-from .circuits import Circuits
+from .compatibility import TileCompatibility, compile_compatibility
+
+if TYPE_CHECKING:
+    from .sequential_dominoes import create as sequential_dominoes
+    from .ascii_boxes import create as ascii_box_tiles
+    from .ascii_blocks import create as ascii_block_tiles
+    from .hex_pipes import create as hex_pipe_tiles
+    from .voxel_pipes import create as voxel_pipe_tiles
+    from .image_store import TileImageStore, default_image_store
+    from .image_tiles import ImageTile, ImageTileSet
+    from .edge_tiles import EdgeTileSet
+    from .green_knots import GreenKnots
+    from .circles import Circles
+    from .circuits import Circuits
 
 __all__ = [
     'Tile',
     'Connector',
     'create_paired_connectors',
+    'TileCompatibility',
+    'compile_compatibility',
     'sequential_dominoes',
     'ascii_box_tiles',
     'ascii_block_tiles',
+    'hex_pipe_tiles',
+    'voxel_pipe_tiles',
+    'TileImageStore',
+    'default_image_store',
     'ImageTile',
     'ImageTileSet',
+    'EdgeTileSet',
     'GreenKnots',
     'Circles',
     'Circuits',
 ]
+
+
+# The module and attribute providing each lazily imported name
+_lazy_attributes = {
+    'sequential_dominoes': ('.sequential_dominoes', 'create'),
+    'ascii_box_tiles': ('.ascii_boxes', 'create'),
+    'ascii_block_tiles': ('.ascii_blocks', 'create'),
+    'hex_pipe_tiles': ('.hex_pipes', 'create'),
+    'voxel_pipe_tiles': ('.voxel_pipes', 'create'),
+    'TileImageStore': ('.image_store', 'TileImageStore'),
+    'default_image_store': ('.image_store', 'default_image_store'),
+    'ImageTile': ('.image_tiles', 'ImageTile'),
+    'ImageTileSet': ('.image_tiles', 'ImageTileSet'),
+    'EdgeTileSet': ('.edge_tiles', 'EdgeTileSet'),
+    'GreenKnots': ('.green_knots', 'GreenKnots'),
+    'Circles': ('.circles', 'Circles'),
+    'Circuits': ('.circuits', 'Circuits'),
+}
+
+
+def __getattr__(name: str) -> object:
+    """Imports the module providing a tile set on first access, then keeps the result."""
+
+    if name not in _lazy_attributes:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module_name, attribute = _lazy_attributes[name]
+    value = getattr(importlib.import_module(module_name, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
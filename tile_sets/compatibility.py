@@ -0,0 +1,160 @@
+"""Compiles the connectors of a tile set into per-direction neighbour compatibility masks."""
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Callable, Sequence
+
+import grids
+
+from .tile_types import Tile, Connector
+
+
+TileConnectors = tuple[tuple[grids.Direction, int], ...]
+TileSetSignature = tuple[tuple[TileConnectors, ...], tuple[tuple[int, ...], ...]]
+
+ALLOWED_MASK_CACHE_SIZE = 2**14  # Combined masks kept for each compiled tile set
+
+
+@dataclass(frozen = True)
+class TileCompatibility:
+    """Lists, for each direction and tile index, a bitmask of the tiles allowed alongside it."""
+
+    num_tiles: int
+    allowed_neighbours: dict[grids.Direction, tuple[int, ...]]
+
+    @property
+    def full_mask(self) -> int:
+        return (1 << self.num_tiles) - 1
+
+    @property
+    def num_bytes(self) -> int:
+        return (self.num_tiles + 7) // 8
+
+
+    @cached_property
+    def allowed_by_byte(self) -> dict[grids.Direction, list[list[int]]]:
+        """Tabulates the combined allowed masks of every value of each byte of a state.
+
+        Combining the masks of a large state then takes one lookup per byte, rather than one per
+        tile. Each value extends the value without its lowest bit, so each table is built in a
+        single pass.
+        """
+
+        tables = {}
+        for direction, allowed_neighbours in self.allowed_neighbours.items():
+            byte_tables = []
+            for byte_index in range(self.num_bytes):
+                byte_table = [0] * 256
+                for value in range(1, 256):
+                    tile_index = byte_index * 8 + (value & -value).bit_length() - 1
+                    byte_table[value] = byte_table[value & (value - 1)] | (
+                        allowed_neighbours[tile_index] if tile_index < self.num_tiles else 0
+                    )
+                byte_tables.append(byte_table)
+            tables[direction] = byte_tables
+        return tables
+
+
+    @cached_property
+    def get_allowed_mask(self) -> Callable[[grids.Direction, int], int]:
+        """Combines the allowed neighbour masks for every tile in a state, in the direction given.
+
+        The combined masks of recent states are kept in a bounded cache, which is shared by every
+        wave function (and clone) using the compiled tile set.
+        """
+
+        return lru_cache(maxsize = ALLOWED_MASK_CACHE_SIZE)(self._combine_allowed_masks)
+
+
+    def _combine_allowed_masks(self, direction: grids.Direction, state: int) -> int:
+
+        mask = 0
+        if state.bit_count() <= self.num_bytes:
+            allowed_neighbours = self.allowed_neighbours[direction]
+            while state:
+                lowest_bit = state & -state
+                mask |= allowed_neighbours[lowest_bit.bit_length() - 1]
+                state ^= lowest_bit
+        else:  # Large states are combined a byte at a time
+            byte_tables = self.allowed_by_byte[direction]
+            for byte_table, byte in zip(byte_tables, state.to_bytes(self.num_bytes, 'little')):
+                if byte:
+                    mask |= byte_table[byte]
+        return mask
+
+
+def compile_compatibility(tiles: Sequence[Tile]) -> TileCompatibility:
+    """Builds the compatibility table for the tiles provided, reusing any previous compilation.
+
+    Connectors are identified by their position in the tile set rather than by object, so
+    structurally identical tile sets (e.g. repeated calls to the same tile set factory) share a
+    single compiled table.
+    """
+
+    return _compile_signature(_make_signature(tiles))
+
+
+def _make_signature(tiles: Sequence[Tile]) -> TileSetSignature:
+    """Describes the tile set connections in terms of local connector indices."""
+
+    connector_indices: dict[int, int] = {}
+    connectors: list[Connector] = []
+    for tile in tiles:
+        for connector in tile.connectors.values():
+            if id(connector) not in connector_indices:
+                connector_indices[id(connector)] = len(connectors)
+                connectors.append(connector)
+
+    tile_connectors = tuple(
+        tuple(
+            (direction, connector_indices[id(connector)])
+            for direction, connector in tile.connectors.items()
+        )
+        for tile in tiles
+    )
+    connector_links = tuple(
+        tuple(sorted(
+            connector_indices[id(linked_connector)]
+            for linked_connector in connector.connects_to
+            if id(linked_connector) in connector_indices
+        ))
+        for connector in connectors
+    )
+    return tile_connectors, connector_links
+
+
+@lru_cache(maxsize = 32)
+def _compile_signature(signature: TileSetSignature) -> TileCompatibility:
+
+    tile_connectors, connector_links = signature
+
+    # Group tiles by the connector they present in each direction
+    tiles_by_connector: dict[grids.Direction, dict[int, int]] = {
+        direction: {} for direction in grids.Direction
+    }
+    for tile_index, connectors in enumerate(tile_connectors):
+        for direction, connector_index in connectors:
+            direction_tiles = tiles_by_connector[direction]
+            direction_tiles[connector_index] = (
+                direction_tiles.get(connector_index, 0) | 1 << tile_index
+            )
+
+    # A neighbour is allowed if its opposing connector accepts the tile's connector
+    accepted_by: list[list[int]] = [[] for _ in connector_links]
+    for connector_index, linked_indices in enumerate(connector_links):
+        for linked_index in linked_indices:
+            accepted_by[linked_index].append(connector_index)
+
+    allowed_neighbours: dict[grids.Direction, tuple[int, ...]] = {}
+    for direction in grids.Direction:
+        opposing_tiles = tiles_by_connector[grids.flip_direction(direction)]
+        masks = []
+        for connectors in tile_connectors:
+            tile_connector_index = dict(connectors).get(direction)
+            mask = 0
+            if tile_connector_index is not None:
+                for opposing_index in accepted_by[tile_connector_index]:
+                    mask |= opposing_tiles.get(opposing_index, 0)
+            masks.append(mask)
+        allowed_neighbours[direction] = tuple(masks)
+
+    return TileCompatibility(len(tile_connectors), allowed_neighbours)
@@ -0,0 +1,158 @@
+"""Derives tile sets from directories of images, connecting tiles whose edge pixels match."""
+from collections import Counter
+from pathlib import Path
+from typing import TypedDict
+import hashlib
+import json
+
+import numpy as np
+import numpy.typing as npt
+import grids
+
+from .tile_types import Connector
+from .image_tiles import ImageTile, ImageTileSet
+from .compatibility import compile_compatibility
+
+
+# The edges of each orientation, each read from top to bottom or left to right
+EDGE_DIRECTIONS = [
+    grids.Direction.LEFT, grids.Direction.UP,
+    grids.Direction.RIGHT, grids.Direction.DOWN,
+]
+
+
+class Orientation(TypedDict):
+    rotation: int
+    reflected: bool
+    pixels: str  # Hash of the whole oriented image, identifying symmetric orientations
+    edges: list[str]  # Hashes of the edge pixels, ordered as for `EDGE_DIRECTIONS`
+
+
+class ImageMetadata(TypedDict):
+    size: list[int]  # As (width, height)
+    orientations: list[Orientation]
+
+
+def _hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size = 8).hexdigest()
+
+
+def derive_metadata(path: Path) -> ImageMetadata:
+    """Hashes the edges of every rotation and reflection of a square tile image."""
+
+    from PIL import Image as pillow  # Deferred, as cached metadata avoids decoding images
+    with pillow.open(path) as image:
+        pixels: npt.NDArray[np.uint8] = np.asarray(image.convert('RGB'))
+    assert pixels.shape[0] == pixels.shape[1], f'{path} is not square'
+
+    orientations: list[Orientation] = []
+    for reflected in [False, True]:
+        reflected_pixels = np.fliplr(pixels) if reflected else pixels
+        for rotation in range(4):
+            oriented = np.rot90(reflected_pixels, -rotation)  # Clockwise, as for `ImageTile`
+            edges = [oriented[:, 0], oriented[0], oriented[:, -1], oriented[-1]]
+            orientations.append({
+                'rotation': rotation,
+                'reflected': reflected,
+                'pixels': _hash_bytes(np.ascontiguousarray(oriented).tobytes()),
+                'edges': [_hash_bytes(edge.tobytes()) for edge in edges],
+            })
+    return {'size': [pixels.shape[1], pixels.shape[0]], 'orientations': orientations}
+
+
+class EdgeTileSet(ImageTileSet):
+    """A tile set built from every image in a directory, in each of their distinct orientations.
+
+    Tiles may be placed alongside each other wherever the pixels along their shared edges are
+    identical, with each distinct edge becoming a connector. Orientations matching an earlier one
+    pixel for pixel are skipped, so symmetric images only appear once per distinct orientation.
+
+    The edge hashes of each image are cached in a JSON file, keyed by a hash of the image file, so
+    that unchanged images are not decoded again.
+    """
+
+    tile_prototypes = {}
+
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str = '*.png',
+        reflections: bool = False,
+        boundary_tile: str | None = None,
+        weights: dict[str, float] = {},
+        cache_path: Path | None = None,
+    ) -> None:
+        """Loads the tiles matching the pattern in the directory.
+
+        The boundary connector is the left edge of the image named by `boundary_tile`, or
+        otherwise the most common edge. Weights are given by image name, applying to every
+        orientation of the image, and the cache defaults to a file in the directory.
+        """
+
+        self.cache_path = cache_path or directory / '.edge_signatures.json'
+        self.images_read = 0
+        paths = sorted(directory.glob(pattern))
+        assert paths, f'No images match {pattern} in {directory}'
+        metadata = self._load_metadata(paths)
+
+        connectors: dict[str, Connector] = {}
+        edge_counts: Counter[str] = Counter()
+        self.tiles = []
+        for path in paths:
+            image_metadata = metadata[path.stem]
+            seen_orientations = set()
+            for orientation in image_metadata['orientations']:
+                if orientation['reflected'] and not reflections:
+                    continue
+                if orientation['pixels'] in seen_orientations:
+                    continue
+                seen_orientations.add(orientation['pixels'])
+
+                for edge in orientation['edges']:
+                    if edge not in connectors:
+                        connectors[edge] = Connector(edge)
+                    edge_counts[edge] += 1
+                suffix = 'm' if orientation['reflected'] else ''
+                self.tiles.append(ImageTile(
+                    f'{path.stem}{orientation["rotation"] + 1}{suffix}',
+                    {
+                        direction: connectors[edge]
+                        for direction, edge in zip(EDGE_DIRECTIONS, orientation['edges'])
+                    },
+                    {
+                        'path': str(path),
+                        'rotation': orientation['rotation'],
+                        'reflected': orientation['reflected'],
+                    },
+                    weight = weights.get(path.stem, 1.),
+                ))
+
+        width, height = metadata[paths[0].stem]['size']
+        self.images_size = (width, height)
+        boundary_edge = (
+            metadata[boundary_tile]['orientations'][0]['edges'][0] if boundary_tile
+            else edge_counts.most_common(1)[0][0]
+        )
+        self.boundary_connector = connectors[boundary_edge]
+        self.compatibility = compile_compatibility(self.tiles)
+
+
+    def _load_metadata(self, paths: list[Path]) -> dict[str, ImageMetadata]:
+        """Finds the metadata of each image by name, from the cache or by decoding the image."""
+
+        try:
+            cache: dict[str, ImageMetadata] = json.loads(self.cache_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            cache = {}
+
+        metadata = {}
+        for path in paths:
+            file_hash = _hash_bytes(path.read_bytes())
+            if file_hash not in cache:
+                cache[file_hash] = derive_metadata(path)
+                self.images_read += 1
+            metadata[path.stem] = cache[file_hash]
+
+        if self.images_read:
+            self.cache_path.write_text(json.dumps(cache))
+        return metadata
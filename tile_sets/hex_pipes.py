@@ -0,0 +1,59 @@
+"""Describes a set of pipe tiles for hexagonal grids, with pipes leaving any of the six edges."""
+import grids
+
+from . import Tile, Connector
+
+ConnectorsSpec = list[Connector]
+
+# The edges of each tile, clockwise from the left
+EDGE_DIRECTIONS = [
+    grids.Direction.LEFT,
+    grids.Direction.UP_LEFT,
+    grids.Direction.UP_RIGHT,
+    grids.Direction.RIGHT,
+    grids.Direction.DOWN_RIGHT,
+    grids.Direction.DOWN_LEFT,
+]
+
+
+def _generate_tiles_from_spec(connectors: ConnectorsSpec, name: str) -> list[Tile]:
+    """Creates a tile for each distinct rotation of the connectors."""
+
+    tiles: list[Tile] = []
+    rotations: list[ConnectorsSpec] = []
+    for rotation in range(len(connectors)):
+        rotated_connectors = connectors[-rotation:] + connectors[:-rotation]
+        if rotated_connectors in rotations:
+            break  # Symmetric tiles repeat their earlier rotations
+        rotations.append(rotated_connectors)
+
+        tiles.append(Tile(
+            f'{name}-{rotation}',
+            dict(zip(EDGE_DIRECTIONS, rotated_connectors)),
+        ))
+
+    return tiles
+
+
+def create() -> tuple[list[Connector], list[Tile]]:
+
+    # Define connectors
+    c0 = Connector('0')
+    c1 = Connector('1')
+    connectors = [c0, c1]
+
+    # Define tile specs
+    tile_specs: list[tuple[ConnectorsSpec, str]] = [
+        ([c0, c0, c0, c0, c0, c0], 'blank'),
+        ([c1, c0, c0, c0, c0, c0], 'end'),
+        ([c1, c0, c0, c1, c0, c0], 'straight'),
+        ([c1, c1, c0, c0, c0, c0], 'tight-bend'),
+        ([c1, c0, c1, c0, c0, c0], 'wide-bend'),
+        ([c1, c0, c1, c0, c1, c0], 'fork'),
+    ]
+
+    # Generate tiles
+    tiles: list[Tile] = []
+    for tile_spec in tile_specs:
+        tiles.extend(_generate_tiles_from_spec(*tile_spec))
+    return connectors, tiles
@@ -0,0 +1,112 @@
+"""Decodes tile images once per process, packing them into atlases which processes can share."""
+from pathlib import Path
+from typing import NotRequired, Sequence, TypedDict
+import hashlib
+import os
+
+import numpy as np
+import numpy.typing as npt
+
+
+class ImageSpec(TypedDict):
+    path: str
+    rotation: int
+    reflected: NotRequired[bool]  # Mirrored left to right, before rotating
+
+
+ImageKey = tuple[str, int, bool]
+
+
+def get_image_key(image_spec: ImageSpec) -> ImageKey:
+    return image_spec['path'], image_spec['rotation'], image_spec.get('reflected', False)
+
+
+class TileImageStore:
+    """Holds every orientation of each tile image file, decoding each file only once.
+
+    Image files are assumed not to change for as long as the store is in use. With a cache
+    directory, atlases are also saved as `.npy` files and memory-mapped from then on, so that
+    every process using the same atlas shares a single copy of its pixels.
+    """
+
+    def __init__(self, cache_directory: Path | None = None):
+        self.cache_directory = cache_directory
+        self.files_decoded = 0
+        self._orientations: dict[str, npt.NDArray[np.uint8]] = {}
+        self._atlases: dict[tuple[ImageKey, ...], npt.NDArray[np.uint8]] = {}
+
+
+    def get_orientations(self, path: str) -> npt.NDArray[np.uint8]:
+        """Returns each orientation of an image file, indexed by [reflected, rotation, y, x]."""
+
+        if path not in self._orientations:
+            from PIL import Image as pillow  # Deferred until images are first needed
+            with pillow.open(path) as image:
+                pixels: npt.NDArray[np.uint8] = np.asarray(image.convert('RGB'), dtype = np.uint8)
+            assert pixels.shape[0] == pixels.shape[1], f'{path} is not square'
+            self.files_decoded += 1
+
+            orientations = np.stack([
+                np.rot90(variant, -rotation)  # Clockwise, as +ve rotation is anticlockwise
+                for variant in [pixels, np.fliplr(pixels)]
+                for rotation in range(4)
+            ]).reshape(2, 4, *pixels.shape)
+            orientations.flags.writeable = False
+            self._orientations[path] = orientations
+        return self._orientations[path]
+
+
+    def get_image(self, image_spec: ImageSpec) -> npt.NDArray[np.uint8]:
+        path, rotation, reflected = get_image_key(image_spec)
+        image: npt.NDArray[np.uint8] = self.get_orientations(path)[int(reflected), rotation]
+        return image
+
+
+    def get_atlas(self, image_specs: Sequence[ImageSpec]) -> npt.NDArray[np.uint8]:
+        """Packs the images given into a single read-only (images x h x w x 3) array."""
+
+        keys = tuple(get_image_key(image_spec) for image_spec in image_specs)
+        if keys not in self._atlases:
+            self._atlases[keys] = (
+                self._load_atlas(image_specs, keys) if self.cache_directory
+                else self._pack_atlas(image_specs)
+            )
+        return self._atlases[keys]
+
+
+    def _pack_atlas(self, image_specs: Sequence[ImageSpec]) -> npt.NDArray[np.uint8]:
+        atlas = np.stack([self.get_image(image_spec) for image_spec in image_specs])
+        atlas.flags.writeable = False
+        return atlas
+
+
+    def _load_atlas(
+        self,
+        image_specs: Sequence[ImageSpec],
+        keys: tuple[ImageKey, ...],
+    ) -> npt.NDArray[np.uint8]:
+        """Memory-maps the cached copy of an atlas, packing and saving it first if needed.
+
+        Cache files are named after the images and the state of their files, so an atlas is
+        packed again whenever any of its images change.
+        """
+
+        assert self.cache_directory
+        file_states = {
+            path: (os.stat(path).st_mtime_ns, os.stat(path).st_size) for path, _, _ in keys
+        }
+        digest = hashlib.blake2b(repr((keys, file_states)).encode(), digest_size = 16)
+        cache_path = self.cache_directory / f'atlas_{digest.hexdigest()}.npy'
+
+        if not cache_path.exists():
+            self.cache_directory.mkdir(parents = True, exist_ok = True)
+            partial_path = cache_path.with_suffix(f'.{os.getpid()}.partial')
+            with open(partial_path, 'wb') as file:
+                np.save(file, self._pack_atlas(image_specs))
+            os.replace(partial_path, cache_path)  # Other processes never see partial atlases
+
+        atlas: npt.NDArray[np.uint8] = np.load(cache_path, mmap_mode = 'r')
+        return atlas
+
+
+default_image_store = TileImageStore()
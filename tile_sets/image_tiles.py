@@ -1,13 +1,17 @@
 from abc import ABC
-from typing import TypedDict
+from typing import TYPE_CHECKING, NotRequired, TypedDict
 from dataclasses import dataclass
 from functools import cached_property
 import enum
 
-from PIL import Image as pillow
 import grids
 
 from .tile_types import Tile, Connector
+from .image_store import ImageSpec, default_image_store
+from .compatibility import compile_compatibility
+
+if TYPE_CHECKING:
+    from PIL import Image as pillow
 
 
 ConnectorsSpec = tuple[Connector, Connector, Connector, Connector]
@@ -17,11 +21,7 @@ class TilePrototype(TypedDict):
     connectors: ConnectorsSpec
     rotations: int
     image_path: str
-
-
-class ImageSpec(TypedDict):
-    path: str
-    rotation: int
+    weight: NotRequired[float]  # Applies to each rotation, defaulting to one
 
 
 @dataclass
@@ -32,9 +32,9 @@ class ImageTile(Tile):
         return hash(self.id)
 
     @cached_property
-    def image(self) -> pillow.Image:
-        img = pillow.open(self.image_spec['path'])
-        return img.rotate(-90 * self.image_spec['rotation'])  # +ve rotation is anticlockwise
+    def image(self) -> 'pillow.Image':
+        from PIL import Image as pillow  # Deferred, as most tile set users never need images
+        return pillow.fromarray(default_image_store.get_image(self.image_spec))
 
 
 def _connectors_from_spec(
@@ -61,8 +61,16 @@ class ImageTileSet(ABC):
         pass
 
 
-    def __init__(self, tile_types: list[TileTypes] = []) -> None:
-        """Generates the tiles for the tileset based on the subset provided."""
+    def __init__(
+        self,
+        tile_types: list[TileTypes] = [],
+        weights: dict[TileTypes, float] = {},
+    ) -> None:
+        """Generates the tiles for the tileset based on the subset provided.
+
+        Weights given for tile types override those of the prototypes, making each rotation of
+        those types proportionally more (or less) likely to be selected.
+        """
 
         filtered_tile_types = {
             tile_type: tile_prototype
@@ -77,5 +85,8 @@ class ImageTileSet(ABC):
                     f'{tile_type.value}{rotation + 1}',
                     _connectors_from_spec(tile_prototype['connectors'], rotation),
                     {'path': tile_prototype['image_path'], 'rotation': rotation},
+                    weight = weights.get(tile_type, tile_prototype.get('weight', 1.)),
                 ))
 
+        self.compatibility = compile_compatibility(self.tiles)
+
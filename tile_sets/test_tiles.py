@@ -1,6 +1,21 @@
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest import TestCase
+import subprocess
+import sys
+
+from PIL import Image as pillow
+import numpy as np
+import grids
 
 from .tile_types import Connector, create_paired_connectors, create_stub_connector
+from .compatibility import ALLOWED_MASK_CACHE_SIZE, compile_compatibility
+from .ascii_blocks import create as ascii_block_tiles
+from .hex_pipes import EDGE_DIRECTIONS, create as hex_pipe_tiles
+from .image_store import TileImageStore
+from .image_tiles import ImageTile
+from .green_knots import GreenKnots
+from .edge_tiles import EdgeTileSet
 
 
 class Test__Connectors(TestCase):
@@ -40,3 +55,208 @@ class Test__Connectors(TestCase):
         self.assertEqual(main.connects_to, {main, stub})
         self.assertEqual(stub.connects_to, {main})
 
+
+class Test__Compatibility(TestCase):
+
+    def test__matches_connectors(self) -> None:
+        """A neighbour is allowed exactly when its opposing connector accepts the tile's one."""
+
+        _, tiles = ascii_block_tiles()
+        compatibility = compile_compatibility(tiles)
+
+        for direction in [grids.Direction.LEFT, grids.Direction.UP]:
+            flipped_direction = grids.flip_direction(direction)
+            for tile_index, tile in enumerate(tiles):
+                for neighbour_index, neighbour in enumerate(tiles):
+                    self.assertEqual(
+                        bool(compatibility.allowed_neighbours[direction][tile_index]
+                             & 1 << neighbour_index),
+                        tile.connectors[direction]
+                        in neighbour.connectors[flipped_direction].connects_to,
+                    )
+
+
+    def test__byte_tables_combine_masks(self) -> None:
+        """Each entry of the byte tables combines the masks of the tiles set in that byte."""
+
+        _, tiles = hex_pipe_tiles()
+        compatibility = compile_compatibility(tiles)
+        for direction, byte_tables in compatibility.allowed_by_byte.items():
+            allowed_neighbours = compatibility.allowed_neighbours[direction]
+            for byte_index, byte_table in enumerate(byte_tables):
+                for value in [0b1, 0b10010110, 0b11111111]:
+                    expected_mask = 0
+                    for bit in range(8):
+                        tile_index = byte_index * 8 + bit
+                        if value & 1 << bit and tile_index < len(tiles):
+                            expected_mask |= allowed_neighbours[tile_index]
+                    self.assertEqual(byte_table[value], expected_mask)
+
+
+    def test__combined_masks_are_cached_within_bounds(self) -> None:
+        """Combined masks match those of the individual tiles, with the cache size bounded."""
+
+        _, tiles = hex_pipe_tiles()
+        compatibility = compile_compatibility(tiles)
+        direction = grids.Direction.UP_LEFT
+        allowed_neighbours = compatibility.allowed_neighbours[direction]
+        for state in range(1, 3 * ALLOWED_MASK_CACHE_SIZE, 3):
+            expected_mask = 0
+            for tile_index in range(len(tiles)):
+                if state & 1 << tile_index:
+                    expected_mask |= allowed_neighbours[tile_index]
+            self.assertEqual(compatibility.get_allowed_mask(direction, state), expected_mask)
+        cache_info = compatibility.get_allowed_mask.cache_info()  # type: ignore[attr-defined]
+        self.assertEqual(cache_info.currsize, ALLOWED_MASK_CACHE_SIZE)
+
+
+    def test__structurally_identical_sets_share_compilation(self) -> None:
+        """Recreating a tile set reuses the previously compiled table."""
+
+        _, first_tiles = ascii_block_tiles()
+        _, second_tiles = ascii_block_tiles()
+        self.assertIs(compile_compatibility(first_tiles), compile_compatibility(second_tiles))
+
+
+class Test__HexPipes(TestCase):
+
+    def test__distinct_rotations(self) -> None:
+        """Every tile has six edges, and symmetric tiles are only included once per rotation."""
+
+        _, tiles = hex_pipe_tiles()
+        self.assertTrue(all(set(tile.connectors) == set(EDGE_DIRECTIONS) for tile in tiles))
+        edges = {
+            tuple(tile.connectors[direction] for direction in EDGE_DIRECTIONS) for tile in tiles
+        }
+        self.assertEqual(len(edges), len(tiles))
+
+
+class Test__ImageTileSet(TestCase):
+
+    def test__weights_apply_to_each_rotation(self) -> None:
+        """Weights for a tile type apply to each of its rotations, with others left at one."""
+
+        tile_set = GreenKnots(weights = {GreenKnots.TileTypes.CORNER: 3.})
+        for tile in tile_set.tiles:
+            self.assertEqual(tile.weight, 3. if tile.id.startswith('r') else 1.)
+
+
+class Test__EdgeTileSet(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        pixels = np.zeros((4, 4, 3), dtype = np.uint8)
+        pixels[:, 0] = pixels[0, 1] = 255  # A hooked line, with no symmetry
+        pillow.fromarray(pixels).save(self.path / 'hook.png')
+        pillow.fromarray(np.zeros((4, 4, 3), dtype = np.uint8)).save(self.path / 'blank.png')
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+
+    def test__matches_hand_wired_green_knots(self) -> None:
+        """Images which meet at their edges give the same tiles and neighbours as hand wiring."""
+
+        def describe_neighbours(tiles: list[ImageTile]) -> set[tuple[object, ...]]:
+            specs = [
+                (Path(tile.image_spec['path']).name, tile.image_spec['rotation']) for tile in tiles
+            ]
+            compatibility = compile_compatibility(tiles)
+            return {
+                (direction, specs[tile_index], specs[neighbour_index])
+                for direction, masks in compatibility.allowed_neighbours.items()
+                for tile_index, mask in enumerate(masks)
+                for neighbour_index in range(len(tiles)) if mask & 1 << neighbour_index
+            }
+
+        tile_set = EdgeTileSet(
+            Path('tile_sets/images'), 'green_knot_*.png', cache_path = self.path / 'cache.json',
+        )
+        self.assertEqual(
+            describe_neighbours(tile_set.tiles), describe_neighbours(GreenKnots().tiles),
+        )
+
+
+    def test__symmetric_orientations_are_skipped(self) -> None:
+        """Each image appears once for each of its distinct rotations (and reflections)."""
+
+        tile_set = EdgeTileSet(self.path)
+        self.assertEqual([tile.id for tile in tile_set.tiles], [
+            'blank1', 'hook1', 'hook2', 'hook3', 'hook4',
+        ])
+        self.assertEqual(len(EdgeTileSet(self.path, reflections = True).tiles), 9)
+
+
+    def test__boundary_connector(self) -> None:
+        """The boundary is the most common edge, unless the edge of a named image is preferred."""
+
+        tile_set = EdgeTileSet(self.path)
+        blank_connector = tile_set.tiles[0].connectors[grids.Direction.UP]
+        self.assertIs(tile_set.boundary_connector, blank_connector)
+        tile_set = EdgeTileSet(self.path, boundary_tile = 'hook')
+        hook_connector = tile_set.tiles[1].connectors[grids.Direction.LEFT]
+        self.assertIs(tile_set.boundary_connector, hook_connector)
+
+
+    def test__metadata_is_cached(self) -> None:
+        """Images are only decoded again once their files have changed."""
+
+        self.assertEqual(EdgeTileSet(self.path).images_read, 2)
+        self.assertEqual(EdgeTileSet(self.path).images_read, 0)
+        pillow.fromarray(np.ones((4, 4, 3), dtype = np.uint8)).save(self.path / 'blank.png')
+        self.assertEqual(EdgeTileSet(self.path).images_read, 1)
+
+
+class Test__TileImageStore(TestCase):
+
+    def test__orientations_match_pillow(self) -> None:
+        """Each orientation matches the image rotated clockwise, after any reflection."""
+
+        store = TileImageStore()
+        for tile in GreenKnots().tiles:
+            with pillow.open(tile.image_spec['path']) as image:
+                reflected_image = image.transpose(pillow.Transpose.FLIP_LEFT_RIGHT)
+                for reflected, oriented_image in [(False, image), (True, reflected_image)]:
+                    np.testing.assert_array_equal(
+                        store.get_image({**tile.image_spec, 'reflected': reflected}),
+                        np.asarray(oriented_image.rotate(-90 * tile.image_spec['rotation'])),
+                    )
+
+
+    def test__files_are_decoded_once(self) -> None:
+        """Recreated tile sets share the images decoded for earlier atlases."""
+
+        store = TileImageStore()
+        atlas = store.get_atlas([tile.image_spec for tile in GreenKnots().tiles])
+        self.assertEqual(atlas.shape, (13, 10, 10, 3))
+        self.assertIs(store.get_atlas([tile.image_spec for tile in GreenKnots().tiles]), atlas)
+        line_tiles = GreenKnots([GreenKnots.TileTypes.LINE]).tiles
+        store.get_atlas([tile.image_spec for tile in line_tiles])
+        self.assertEqual(store.files_decoded, 5)
+
+
+    def test__cached_atlases_are_memory_mapped(self) -> None:
+        """Stores sharing a cache directory map the saved atlas rather than decoding images."""
+
+        image_specs = [tile.image_spec for tile in GreenKnots().tiles]
+        with TemporaryDirectory() as cache_directory:
+            atlas = TileImageStore(Path(cache_directory)).get_atlas(image_specs)
+            store = TileImageStore(Path(cache_directory))
+            mapped_atlas = store.get_atlas(image_specs)
+            self.assertIsInstance(mapped_atlas, np.memmap)
+            self.assertEqual(store.files_decoded, 0)
+            np.testing.assert_array_equal(mapped_atlas, atlas)
+            del atlas, mapped_atlas
+
+
+class Test__LazyImports(TestCase):
+
+    def test__tile_sets_load_on_first_use(self) -> None:
+        """Importing the package and using a non-image tile set does not import Pillow."""
+
+        statement = (
+            'import sys, tile_sets; tile_sets.ascii_box_tiles(); '
+            'sys.exit(("PIL" in sys.modules) + 2 * ("tile_sets.circuits" in sys.modules))'
+        )
+        self.assertEqual(subprocess.run([sys.executable, '-c', statement]).returncode, 0)
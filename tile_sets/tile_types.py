@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import grids
 
@@ -43,4 +43,5 @@ def create_stub_connector(main_connector: Connector, style: str = '') -> Connect
 class Tile:
     id: str
     connectors: dict[grids.Direction, Connector]
+    weight: float = field(default = 1., kw_only = True)  # Relative likelihood of selection
 
@@ -0,0 +1,34 @@
+"""Describes pipe tiles for three dimensional grids, with pipes through up to two faces."""
+from itertools import combinations
+
+import grids
+
+from . import Tile, Connector
+
+# The faces of each tile, in the order used to name them
+FACE_DIRECTIONS = [
+    grids.Direction.LEFT,
+    grids.Direction.RIGHT,
+    grids.Direction.UP,
+    grids.Direction.DOWN,
+    grids.Direction.BACKWARD,
+    grids.Direction.FORWARD,
+]
+
+
+def create() -> tuple[list[Connector], list[Tile]]:
+
+    # Define connectors
+    c0 = Connector('0')
+    c1 = Connector('1')
+    connectors = [c0, c1]
+
+    # Generate tiles: empty space, then pipe ends, straights and bends
+    tiles = [Tile('blank', {face: c0 for face in FACE_DIRECTIONS})]
+    for num_pipes in [1, 2]:
+        for pipe_faces in combinations(FACE_DIRECTIONS, num_pipes):
+            tiles.append(Tile(
+                'pipe-' + ''.join(face.value for face in pipe_faces),
+                {face: c1 if face in pipe_faces else c0 for face in FACE_DIRECTIONS},
+            ))
+    return connectors, tiles
@@ -1,4 +1,5 @@
 from tile_sets import Tile, sequential_dominoes
+import bitset_wave_functions
 import wave_functions
 import grids
 import cli
@@ -6,7 +7,7 @@ import cli
 
 class CliRunner1D(cli.CliRunner):
 
-    def __init__(self, wave_function: wave_functions.WaveFunction, polarised: bool):
+    def __init__(self, wave_function: wave_functions.WaveFunctionLike, polarised: bool):
         super().__init__(wave_function)
         self.polarised = polarised
 
@@ -80,7 +81,7 @@ if __name__ == '__main__':
     # Execution
     grid = grids.Grid1D(GRID_SIZE, GRID_CYCLIC)
     connectors, tile_set = sequential_dominoes(NUM_CONN, GRID_CYCLIC, POLARISED)
-    wave_function = wave_functions.WaveFunction(grid, tile_set)
+    wave_function = bitset_wave_functions.BitsetWaveFunction(grid, tile_set)
 
     if not GRID_CYCLIC:
         wave_function.apply_boundary_constraint(
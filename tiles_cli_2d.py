@@ -1,5 +1,5 @@
 from tile_sets import Tile, ascii_box_tiles
-import wave_functions
+import bitset_wave_functions
 import grids
 import cli
 
@@ -32,7 +32,7 @@ if __name__ == '__main__':
     # Execution
     grid = grids.Grid2D(*GRID_SIZE, *GRID_CYCLIC)
     connectors, tile_set = ascii_box_tiles()
-    wave_function = wave_functions.WaveFunction(grid, tile_set)
+    wave_function = bitset_wave_functions.BitsetWaveFunction(grid, tile_set)
 
     if not GRID_CYCLIC[1]:
         wave_function.apply_boundary_constraint(
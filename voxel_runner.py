@@ -0,0 +1,60 @@
+"""Collapses a three dimensional volume of pipe tiles, saving the tile indices as a NumPy array.
+
+The array is indexed by [z, y, x], holding the position of each tile in `voxel_pipe_tiles()`.
+
+Example:
+    python voxel_runner.py 64 64 64 --output output/pipes.npy
+"""
+from argparse import ArgumentParser
+from pathlib import Path
+import time
+
+import numpy as np
+from tile_sets import voxel_pipe_tiles
+from bitset_wave_functions import BitsetWaveFunction
+import solvers
+import grids
+
+
+def save_tile_indices(wave_function: BitsetWaveFunction, path: Path) -> None:
+    """Saves the tile indices of the wave function as an `.npy` file, in the shape of its grid."""
+
+    np.save(path, wave_function.get_tile_indices(), allow_pickle = False)
+
+
+def main() -> None:
+
+    parser = ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('size_x', type = int)
+    parser.add_argument('size_y', type = int)
+    parser.add_argument('size_z', type = int)
+    parser.add_argument('--cyclic-x', action = 'store_true')
+    parser.add_argument('--cyclic-y', action = 'store_true')
+    parser.add_argument('--cyclic-z', action = 'store_true')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--max-backtracks', type = int, default = 1000)
+    parser.add_argument('--output', type = Path, default = Path('output/voxels.npy'))
+    args = parser.parse_args()
+
+    connectors, tiles = voxel_pipe_tiles()
+    grid = grids.Grid3D(
+        args.size_x, args.size_y, args.size_z, args.cyclic_x, args.cyclic_y, args.cyclic_z,
+    )
+
+    start_time = time.perf_counter()
+    wave_function = BitsetWaveFunction(grid, tiles, seed = args.seed)
+    for direction in grid.directions:
+        wave_function.apply_boundary_constraint(direction, {connectors[0]})
+    stats = solvers.BacktrackingSolver(wave_function, args.max_backtracks).run()
+    print(
+        f'Collapsed {grid.size_total} cells in {time.perf_counter() - start_time:.1f}s '
+        f'({stats.backtracks} backtracks)',
+    )
+
+    args.output.parent.mkdir(parents = True, exist_ok = True)
+    save_tile_indices(wave_function, args.output)
+    print(f'Saved {args.output}')
+
+
+if __name__ == '__main__':
+    main()
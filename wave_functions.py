@@ -1,11 +1,85 @@
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Sequence, TypedDict
+from typing import Protocol, Sequence, TypedDict
+import math
 import random
 
 import grids
 from tile_sets import Tile, Connector
 
 
+class CellLike(Protocol):
+
+    @property
+    def state(self) -> Sequence[Tile]:
+        pass
+
+    @property
+    def collapsed(self) -> bool:
+        pass
+
+    @property
+    def tile(self) -> Tile | None:
+        pass
+
+    @tile.setter
+    def tile(self, tile: Tile) -> None:
+        pass
+
+
+class WaveFunctionLike(Protocol):
+
+    grid: grids.Grid
+
+    @property
+    def cells(self) -> Sequence[CellLike]:
+        pass
+
+    @property
+    def collapsed(self) -> bool:
+        pass
+
+    def get_most_constrained_cell(self) -> CellLike:
+        pass
+
+    def choose_tile(self, cell: CellLike) -> Tile:
+        pass
+
+    def apply_boundary_constraint(
+        self,
+        direction: grids.Direction,
+        constraint: set[Connector],
+    ) -> None:
+        pass
+
+
+@dataclass
+class PropagationStats:
+    """Counts the propagation queue entries which were added, merged into others or processed.
+
+    Entries are only left unprocessed when a contradiction abandons the rest of a wave.
+    """
+
+    enqueued: int = 0
+    coalesced: int = 0
+    processed: int = 0
+
+    def __iadd__(self, other: 'PropagationStats') -> 'PropagationStats':
+        self.enqueued += other.enqueued
+        self.coalesced += other.coalesced
+        self.processed += other.processed
+        return self
+
+
+def get_entropy(state: Sequence[Tile]) -> float:
+    """Calculates the Shannon entropy of a state, with tiles selected in proportion to weight."""
+
+    weight_sum = sum(tile.weight for tile in state)
+    return math.log(weight_sum) - sum(
+        tile.weight * math.log(tile.weight) for tile in state
+    ) / weight_sum
+
+
 class Propagation(TypedDict):
     cell: 'Cell'
     direction: grids.Direction
@@ -17,19 +91,12 @@ class Cell:
     id: str
     state: Sequence[Tile]
     neighbours: dict[grids.Direction, 'Cell'] = field(default_factory = dict)
+    propagation_stats: PropagationStats | None = field(default = None, repr = False)
 
     def __str__(self) -> str:
         return f'Cell {self.id}'
 
 
-    def link_neighbour(self, neighbour: 'Cell', direction: grids.Direction) -> None:
-        neighbour_direction = grids.flip_direction(direction)
-        assert direction not in self.neighbours and neighbour_direction not in neighbour.neighbours
-
-        self.neighbours[direction] = neighbour
-        neighbour.neighbours[neighbour_direction] = self
-
-
     @property
     def collapsed(self) -> bool:
         return len(self.state) == 1
@@ -47,7 +114,7 @@ class Cell:
             'cell': self.neighbours[direction],
             'direction': direction,
             'constraint': self.connectors[direction],
-        } for direction in self.neighbours])
+        } for direction in self.neighbours], self.propagation_stats)
 
 
     @property
@@ -99,19 +166,21 @@ class Cell:
 
 class WaveFunction:
 
-    def __init__(self, grid: grids.Grid, tile_set: Sequence[Tile]):
+    def __init__(self, grid: grids.Grid, tile_set: Sequence[Tile], seed: int | None = None):
         self.grid = grid
+        self.random = random.Random(seed)
+        self.propagation_stats = PropagationStats()
         self.cells = [Cell(
             id = grid.make_cell_id(index),
             state = tile_set,
+            propagation_stats = self.propagation_stats,
         ) for index in range(grid.size_total)]
+        self.weighted = len({tile.weight for tile in tile_set}) > 1
 
-        for cell_slice, direction, cyclic in self.grid.get_neighbour_slices():
-            neighbour_cells = self.cells[cell_slice]
-            for index, cell in enumerate(neighbour_cells[:-1]):
-                cell.link_neighbour(neighbour_cells[index + 1], direction)
-            if cyclic:
-                neighbour_cells[-1].link_neighbour(neighbour_cells[0], direction)
+        for direction, neighbour_table in grid.get_neighbour_tables().items():
+            for cell, neighbour_index in zip(self.cells, neighbour_table):
+                if neighbour_index >= 0:
+                    cell.neighbours[direction] = self.cells[neighbour_index]
 
 
     @property
@@ -119,10 +188,10 @@ class WaveFunction:
         return all(cell.collapsed for cell in self.cells)
 
     def get_most_constrained_cell(self) -> Cell:
-        """Randomly selects a cell with the smallest possibility space remaining."""
+        """Randomly selects a cell with the smallest possibility space (or entropy) remaining."""
 
         possibility_space = {
-            cell_index: len(cell.state)
+            cell_index: get_entropy(cell.state) if self.weighted else len(cell.state)
             for cell_index, cell
             in enumerate(self.cells)
             if not cell.collapsed  # Ignore already collapsed cells
@@ -133,7 +202,14 @@ class WaveFunction:
             for cell_index, size in possibility_space.items()
             if size == most_constrained_size
         }
-        return self.cells[random.choice(list(possibility_space.keys()))]
+        return self.cells[self.random.choice(list(possibility_space.keys()))]
+
+    def choose_tile(self, cell: CellLike) -> Tile:
+        """Randomly selects one of the tiles still possible in the cell, according to weight."""
+
+        if not self.weighted:
+            return self.random.choice(cell.state)
+        return self.random.choices(cell.state, [tile.weight for tile in cell.state])[0]
 
 
     def apply_boundary_constraint(
@@ -147,22 +223,51 @@ class WaveFunction:
         boundary relative to the grid.
         """
 
-        cell_slice = self.grid.get_boundary_slice(grids.flip_direction(direction))
+        boundary_indices = grids.get_boundary_indices(self.grid, grids.flip_direction(direction))
 
         self.propagate_constraints([{
-            'cell': cell, 'direction': direction, 'constraint': constraint,
-        } for cell in self.cells[cell_slice]])
+            'cell': self.cells[index], 'direction': direction, 'constraint': constraint,
+        } for index in boundary_indices], self.propagation_stats)
 
 
     @staticmethod
-    def propagate_constraints(propagations: list[Propagation]) -> None:
-        """Iteratively applies constraints to cells until a consistent state is reached."""
+    def propagate_constraints(
+        propagations: list[Propagation],
+        stats: PropagationStats | None = None,
+    ) -> PropagationStats:
+        """Iteratively applies constraints to cells until a consistent state is reached.
+
+        Propagations waiting in the queue are keyed by cell and direction, so a new constraint for
+        an entry which has not yet been processed is merged into it rather than queued again. The
+        queue entries are counted into the stats given, if any.
+        """
 
-        while propagations:
-            propagation = propagations.pop(0)
+        stats = stats if stats is not None else PropagationStats()
+        pending: dict[tuple[int, grids.Direction], Propagation] = {}
+        queue: deque[tuple[int, grids.Direction]] = deque()
+
+        def enqueue(propagation: Propagation) -> None:
+            key = (id(propagation['cell']), propagation['direction'])
+            if key in pending:
+                pending[key]['constraint'] = pending[key]['constraint'] & propagation['constraint']
+                stats.coalesced += 1
+            else:
+                pending[key] = propagation
+                queue.append(key)
+                stats.enqueued += 1
+
+        for propagation in propagations:
+            enqueue(propagation)
+
+        while queue:
+            propagation = pending.pop(queue.popleft())
+            stats.processed += 1
             further_propagations = propagation['cell'].constrain(
                 propagation['direction'],
                 propagation['constraint'],
             )
-            propagations.extend(further_propagations)
+            for further_propagation in further_propagations:
+                enqueue(further_propagation)
+
+        return stats
 